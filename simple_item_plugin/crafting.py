@@ -1,6 +1,6 @@
 from copy import deepcopy
 from dataclasses import dataclass, field
-from model_resolver.utils import PackGetterV2
+from functools import cached_property
 from nbtlib import serialize_tag
 from nbtlib.tag import (
     String,
@@ -9,16 +9,17 @@ from nbtlib.tag import (
     Int,
     Byte,
 )
-from typing import TYPE_CHECKING, Any, Literal, Self, Union, Tuple, Optional, Generator, Callable
+from typing import TYPE_CHECKING, Any, Literal, Self, Union, Tuple, Optional, Generator, Callable, Iterable, Mapping, Hashable
 from beet import Context, Function, FunctionTag, Recipe
 from pydantic import BaseModel
 from simple_item_plugin.item import Item
 from simple_item_plugin.types import NAMESPACE, TranslatedString
 from simple_item_plugin.utils import Registry, ItemProtocol
+from simple_item_plugin.tags import TagResolver
+from simple_item_plugin.versioning.api import PublicApi
 from model_resolver.item_model.item import Item as ModelResolverItem
+import hashlib
 import json
-import random
-from model_resolver.item_model.data_component_predicate import iter_tagged_id
 from beet import Generator as BeetGenerator
 from weld_deps.contrib.mecha_auto_include import PluginDepsHolder
 
@@ -32,9 +33,6 @@ class VanillaItem(Registry):
     additional_pages: Optional[list[Any]] = None
 
     __soft_new__ = True
-    def __hash__(self) -> int:
-        return hash(self.id)
-
 
     def to_nbt(self, ctx: Context, i: int) -> Compound:
         return Compound({"id": String(self.id), "Slot": Byte(i)})
@@ -78,9 +76,6 @@ class ExternalItem(Registry):
 
     additional_pages: Optional[list[Any]] = None
 
-    def __hash__(self) -> int:
-        return hash(self.id)
-    
     def to_nbt(self, ctx: Context, i: int) -> Compound:
         # return the nbt tag of the item smithed id "SelectedItem.components."minecraft:custom_data".smithed.id"
         return Compound(
@@ -153,9 +148,7 @@ class RecipeItemTag(Registry):
 
     def get_first_item(self, ctx: Context | BeetGenerator) -> str:
         real_ctx = ctx if isinstance(ctx, Context) else ctx.ctx
-        getter = PackGetterV2.from_context(real_ctx)
-        items = list(iter_tagged_id(self.tagged_id, getter.data.item_tags))
-        return items[0]
+        return real_ctx.inject(TagResolver).first_member(self.id)
 
     @property
     def tagged_id(self):
@@ -193,13 +186,67 @@ class ConditionalCrafting(BaseModel):
     fake_player: str
     value: int
 
+def content_item_key(item: ItemType) -> Optional[str]:
+    if item is None:
+        return None
+    if isinstance(item, Registry):
+        return f"{item.registry_key.base.__name__}:{item.id}"
+    return f"{type(item).__name__}:{item.id}"
+
+
+def content_id(*parts: Any) -> str:
+    """
+    Id derived from the content of a recipe, the same recipe gets the same id on every build
+    """
+    dumped = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(dumped.encode()).hexdigest()[:16]
+
+
+def deduplicate_content_id(ctx: Context, recipe: "ShapedRecipe | NBTSmelting") -> "ShapedRecipe | NBTSmelting":
+    """
+    Identical recipes get the same content id, the next ones are exported as a copy suffixed in export order.
+    The id of the given recipe is never changed, it may already be hashed
+    """
+    if recipe.id != recipe.content_id():
+        return recipe
+    unique_id = recipe.id
+    i = 2
+    while (other := type(recipe).get(ctx, unique_id, default=None)) is not None and other is not recipe:
+        unique_id = f"{recipe.id}_{i}"
+        i += 1
+    if unique_id == recipe.id:
+        return recipe
+    return recipe.model_copy(update={"id": unique_id})
+
+
 class ShapedRecipe(Registry):
-    id: str = field(default_factory=lambda: str(hash(random.random())))
+    # derived from the content when not set
+    id: str = ""
     items: Tuple[ItemLine, ItemLine, ItemLine] | Tuple[ItemLine, ItemLine] | Tuple[ItemLine,]
     result: tuple[ItemProtocol, int]
     flags: list[str] = field(default_factory=lambda: [])
     conditional_crafting: ConditionalCrafting | None = None
 
+    def model_post_init(self, __context: Any) -> None:
+        if not self.id:
+            self.id = self.content_id()
+
+    def content_id(self) -> str:
+        return content_id(
+            "shaped",
+            [[content_item_key(item) for item in row] for row in self.items],
+            [content_item_key(self.result[0]), self.result[1]],
+            self.flags,
+            self.conditional_crafting.model_dump() if self.conditional_crafting else None,
+        )
+
+    def check_invariants(self):
+        super().check_invariants()
+        if not 1 <= len(self.items) <= 3 or any(len(row) != 3 for row in self.items):
+            raise ValueError(f"Invalid recipe grid for {self.result[0].id}")
+        if self.result[1] < 1:
+            raise ValueError(f"Invalid result count for {self.result[0].id}")
+
     def get_command(self, if_data_storage: str):
         if_score = ""
         if self.conditional_crafting is not None:
@@ -228,21 +275,17 @@ execute
         """
         This function export the smithed crafter recipes to the ctx variable.
         if is_external_recipe is True, the recipe will only be added to the registry and not to the function.
+        Returns the exported recipe, a copy with a suffixed id when an identical recipe was already exported.
         """
+        if (recipe := deduplicate_content_id(ctx, self)) is not self:
+            return recipe.export(ctx, is_external_recipe)
         super().export(ctx)
         PluginDepsHolder.add_plugin_deps("crafter")
         if is_external_recipe:
             return self
-        air = lambda i: Compound({"id": String("minecraft:air"), "Slot": Byte(i)})
-
-        smithed_recipe = {}
-        for i, item_row in enumerate(self.items):
-            row_check_list = [
-                x.to_nbt(ctx, i) if x is not None else air(i) for i, x in enumerate(item_row)
-            ]
-            smithed_recipe[String(i)] = List[Compound](row_check_list)
-
-        if_data_storage = f"if data storage smithed.crafter:input recipe{serialize_tag(Compound(smithed_recipe))}"
+        # same output as serializing the whole recipe compound, built from the memoized rows
+        rows = ", ".join(f"{i}: {recipe_row_snbt(ctx, item_row)}" for i, item_row in enumerate(self.items))
+        if_data_storage = f"if data storage smithed.crafter:input recipe{{{rows}}}"
 
         if len(self.items) < 3:
             for i in range(len(self.items), 3):
@@ -251,28 +294,75 @@ execute
                 )
 
         function_path = f"{NAMESPACE}:impl/smithed.crafter/recipes"
-        function_path_calls = f"{NAMESPACE}:impl/calls/smithed.crafter/recipes"
-        tag_smithed_crafter_recipes = "smithed.crafter:event/recipes"
-        tag_namespace = f"{NAMESPACE}:smithed.crafter/recipes"
-        if not tag_smithed_crafter_recipes in ctx.data.function_tags:
-            ctx.data.function_tags[tag_smithed_crafter_recipes] = FunctionTag()
-        if not tag_namespace in ctx.data.function_tags:
-            ctx.data.function_tags[tag_namespace] = FunctionTag()
-        if function_path not in ctx.data.functions:
-            ctx.data.functions[function_path] = Function("# @public\n\n")
-        if f"#{tag_namespace}" not in ctx.data.function_tags[tag_smithed_crafter_recipes].data["values"]:
-            ctx.data.function_tags[tag_smithed_crafter_recipes].data["values"].append(
-                f"#{tag_namespace}"
-            )
-        if function_path_calls not in ctx.data.function_tags[tag_namespace].data["values"]:
-            ctx.data.function_tags[tag_namespace].data["values"].append(
-                function_path_calls
-            )
+        setup_crafter_function(
+            ctx,
+            function_path,
+            f"{NAMESPACE}:impl/calls/smithed.crafter/recipes",
+            "smithed.crafter:event/recipes",
+            f"{NAMESPACE}:smithed.crafter/recipes",
+        )
 
         ctx.data.functions[function_path].append(self.get_command(if_data_storage))
         return self
 
 
+@dataclass(frozen=True)
+class RecipeTemplate:
+    """
+    Shaped recipe pattern written once and instantiated for many item sets,
+    e.g. a pickaxe is `RecipeTemplate("III/.S./.S.", {"I": "ingot", "S": "stick"}, "pickaxe")`.
+    Each character of the pattern is a key of `keys`, `.` is an empty slot.
+    """
+    pattern: str
+    keys: dict[str, str]
+    result: str
+    count: int = 1
+
+    @cached_property
+    def rows(self) -> tuple[tuple[Optional[str], ...], ...]:
+        rows = tuple(
+            tuple(None if char == "." else self.keys[char] for char in row)
+            for row in self.pattern.split("/")
+        )
+        assert 1 <= len(rows) <= 3 and all(len(row) == 3 for row in rows), f"Invalid recipe pattern {self.pattern}"
+        return rows
+
+    @cached_property
+    def required(self) -> set[str]:
+        return {self.result, *self.keys.values()}
+
+    def instantiate(self, items: Mapping[str, Optional[ItemProtocol]]) -> Optional[ShapedRecipe]:
+        """
+        Recipe with the items of the set, None if one of them is missing
+        """
+        if any(items.get(name) is None for name in self.required):
+            return None
+        return ShapedRecipe.construct_trusted(
+            items=tuple(
+                tuple(items[name] if name is not None else None for name in row)
+                for row in self.rows
+            ),
+            result=(items[self.result], self.count),
+        )
+
+
+def export_recipe_templates(
+    ctx: Context,
+    templates: Iterable[RecipeTemplate],
+    item_sets: Iterable[Mapping[str, Optional[ItemProtocol]]],
+) -> list[ShapedRecipe]:
+    """
+    Export every template for every item set, templates with missing items are skipped
+    """
+    templates = list(templates)
+    res = []
+    for items in item_sets:
+        for template in templates:
+            if recipe := template.instantiate(items):
+                res.append(recipe.export(ctx))
+    return res
+
+
 @dataclass
 class ShapelessRecipe:
     items: list[tuple[ItemProtocol, int]]
@@ -317,7 +407,7 @@ class ShapelessRecipe:
             real_lines = (lines[0], lines[1], lines[2])
         else:
             raise ValueError("Invalid number of lines")
-        ShapedRecipe(
+        ShapedRecipe.construct_trusted(
             items=real_lines,
             result=self.result
         ).export(ctx, is_external_recipe=True)
@@ -350,43 +440,50 @@ execute
     run {result_command}
 """
         function_path = f"{NAMESPACE}:impl/smithed.crafter/shapeless_recipes"
-        function_path_calls = f"{NAMESPACE}:impl/calls/smithed.crafter/shapeless_recipes"
-        tag_smithed_crafter_shapeless_recipes = (
-            "smithed.crafter:event/shapeless_recipes"
+        setup_crafter_function(
+            ctx,
+            function_path,
+            f"{NAMESPACE}:impl/calls/smithed.crafter/shapeless_recipes",
+            "smithed.crafter:event/shapeless_recipes",
+            f"{NAMESPACE}:smithed.crafter/shapeless_recipes",
         )
-        tag_namespace = f"{NAMESPACE}:smithed.crafter/shapeless_recipes"
-        if not tag_smithed_crafter_shapeless_recipes in ctx.data.function_tags:
-            ctx.data.function_tags[
-                tag_smithed_crafter_shapeless_recipes
-            ] = FunctionTag()
-        if not tag_namespace in ctx.data.function_tags:
-            ctx.data.function_tags[tag_namespace] = FunctionTag()
-        if function_path not in ctx.data.functions:
-            ctx.data.functions[function_path] = Function("# @public\n\n")
-        if f"#{tag_namespace}" not in ctx.data.function_tags[tag_smithed_crafter_shapeless_recipes].data["values"]:
-            ctx.data.function_tags[tag_smithed_crafter_shapeless_recipes].data[
-                "values"
-            ].append(f"#{tag_namespace}")
-        if function_path_calls not in ctx.data.function_tags[tag_namespace].data["values"]:
-            ctx.data.function_tags[tag_namespace].data[
-                "values"
-            ].append(function_path_calls)
 
         ctx.data.functions[function_path].append(command)
 
 
 class NBTSmelting(Registry):
-    id: str = field(default_factory=lambda: str(hash(random.random())))
+    # derived from the content when not set
+    id: str = ""
     item: ItemProtocol
     result: tuple[ItemProtocol, int]
     types: list[Literal["furnace", "blast_furnace", "smoker"]] = field(
         default_factory=lambda: ["furnace"]
     )
 
+    def model_post_init(self, __context: Any) -> None:
+        if not self.id:
+            self.id = self.content_id()
+
+    def content_id(self) -> str:
+        return content_id(
+            "smelting",
+            content_item_key(self.item),
+            [content_item_key(self.result[0]), self.result[1]],
+            self.types,
+        )
+
+    def check_invariants(self):
+        super().check_invariants()
+        if self.result[1] < 1:
+            raise ValueError(f"Invalid result count for {self.result[0].id}")
+
     def export(self, ctx: Context):
         """
         This function export the NBTSmelting recipes to the ctx variable.
+        Returns the exported recipe, a copy with a suffixed id when an identical recipe was already exported.
         """
+        if (recipe := deduplicate_content_id(ctx, self)) is not self:
+            return recipe.export(ctx)
         for type in self.types:
             self.export_type(ctx, type)
         return super().export(ctx)
@@ -420,6 +517,7 @@ execute
             ctx.data.function_tags[tag_nbt_smelting_furnace] = FunctionTag()
         if function_path not in ctx.data.functions:
             ctx.data.functions[function_path] = Function("# @public\n\n")
+            ctx.inject(PublicApi).register(function_path)
             ctx.data.function_tags[tag_nbt_smelting_furnace].data["values"].append(
                 f"#{NAMESPACE}:calls/nbt_smelting/{type}"
             )
@@ -440,6 +538,84 @@ execute
             )
 
 
+def recipe_item_key(item: ItemProtocol) -> Hashable:
+    if isinstance(item, Registry):
+        return item.registry_key
+    return (type(item).__name__, item.id)
+
+
+def recipe_row_snbt(ctx: Context, row: ItemLine) -> str:
+    """
+    SNBT of a crafter grid row, memoized per context since the same rows are used by many recipes
+    """
+    fragments = ctx.meta.setdefault("simple_item_plugin", {}).setdefault("crafter_rows", {})
+    key = tuple(recipe_item_key(x) if x is not None else None for x in row)
+    if key not in fragments:
+        fragments[key] = serialize_tag(List[Compound]([
+            x.to_nbt(ctx, i) if x is not None else Compound({"id": String("minecraft:air"), "Slot": Byte(i)})
+            for i, x in enumerate(row)
+        ]))
+    return fragments[key]
+
+
+def setup_crafter_function(ctx: Context, function_path: str, function_path_calls: str, event_tag: str, tag_namespace: str):
+    """
+    Create the function and the function tags calling it, only checked once per context
+    """
+    done = ctx.meta.setdefault("simple_item_plugin", {}).setdefault("crafter_functions", set())
+    if function_path in done:
+        return
+    if not event_tag in ctx.data.function_tags:
+        ctx.data.function_tags[event_tag] = FunctionTag()
+    if not tag_namespace in ctx.data.function_tags:
+        ctx.data.function_tags[tag_namespace] = FunctionTag()
+    if function_path not in ctx.data.functions:
+        ctx.data.functions[function_path] = Function("# @public\n\n")
+    ctx.inject(PublicApi).register(function_path)
+    if f"#{tag_namespace}" not in ctx.data.function_tags[event_tag].data["values"]:
+        ctx.data.function_tags[event_tag].data["values"].append(f"#{tag_namespace}")
+    if function_path_calls not in ctx.data.function_tags[tag_namespace].data["values"]:
+        ctx.data.function_tags[tag_namespace].data["values"].append(function_path_calls)
+    done.add(function_path)
+
+
+@dataclass
+class RecipeIndex:
+    """
+    Recipes producing and using every item, built in one pass over the ShapedRecipe
+    (shapeless recipes are exported as ShapedRecipe) and NBTSmelting registries.
+    """
+    producers: dict[Hashable, list[ShapedRecipe | NBTSmelting]] = field(default_factory=dict)
+    consumers: dict[Hashable, list[ShapedRecipe | NBTSmelting]] = field(default_factory=dict)
+
+    @classmethod
+    def from_context(cls, ctx: Context) -> "RecipeIndex":
+        index = cls()
+        for recipe in ShapedRecipe.iter_values(ctx):
+            index.add(recipe, [item for row in recipe.items for item in row])
+        for recipe in NBTSmelting.iter_values(ctx):
+            index.add(recipe, [recipe.item])
+        return index
+
+    def add(self, recipe: ShapedRecipe | NBTSmelting, ingredients: list[ItemType]):
+        self.producers.setdefault(recipe_item_key(recipe.result[0]), []).append(recipe)
+        seen : set[Hashable] = set()
+        for item in ingredients:
+            if item is None:
+                continue
+            key = recipe_item_key(item)
+            if key in seen:
+                continue
+            seen.add(key)
+            self.consumers.setdefault(key, []).append(recipe)
+
+    def produced_by(self, item: ItemProtocol) -> list[ShapedRecipe | NBTSmelting]:
+        return self.producers.get(recipe_item_key(item), [])
+
+    def used_in(self, item: ItemProtocol) -> list[ShapedRecipe | NBTSmelting]:
+        return self.consumers.get(recipe_item_key(item), [])
+
+
 @dataclass
 class SimpledrawerMaterial:
     block: Item | VanillaItem
@@ -484,6 +660,7 @@ execute
             ctx.data.function_tags[simpledrawer_tag] = FunctionTag()
         if not function_path in ctx.data.functions:
             ctx.data.functions[function_path] = Function("# @public\n\n")
+            ctx.inject(PublicApi).register(function_path)
             ctx.data.function_tags[simpledrawer_tag].data["values"].append(f"#{function_tag_impl}")
         if not function_tag_impl in ctx.data.function_tags:
             ctx.data.function_tags[function_tag_impl] = FunctionTag()
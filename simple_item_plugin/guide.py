@@ -1,16 +1,39 @@
 
 from copy import deepcopy
 from simple_item_plugin.item import ItemGroup, Item
-from simple_item_plugin.crafting import RecipeItemTag, ShapedRecipe, NBTSmelting, VanillaItem, ExternalItem
+from simple_item_plugin.crafting import RecipeItemTag, ShapedRecipe, NBTSmelting, VanillaItem, ExternalItem, RecipeIndex
 from simple_item_plugin.utils import TranslatedString, ItemProtocol, NAMESPACE, Lang, export_translated_string, SimpleItemPluginOptions
 from typing import Any, Callable, Protocol, Literal, Optional, NamedTuple, Iterable, TypeVar
 import json
+import io
+import hashlib
+import bisect
+from enum import Enum
 from dataclasses import dataclass, field
-from beet import Context, Generator, Texture, Font, ItemModifier, configurable
+from functools import cached_property, partial
+from beet import Context, Generator, Texture, Font, ItemModifier, LootTable, Advancement, Function, configurable
 from PIL import Image, ImageDraw, ImageFont
-from model_resolver.render import Render
+from simple_item_plugin.render import RenderService
+from simple_item_plugin.metrics import GuideMetrics
+from model_resolver.utils import DEFAULT_RENDER_SIZE
 from itertools import islice
+from collections import Counter
+import numpy as np
 import pathlib
+import logging
+import time
+
+logger = logging.getLogger("simple_item_plugin")
+
+
+def draft_cached(ctx: Context, opts: SimpleItemPluginOptions, name: str) -> bool:
+    """
+    Whether the draft cached with `draft.cache(name, "guide")` will be loaded from the cache,
+    same check as beet
+    """
+    if opts.disable_guide_cache:
+        return False
+    return ctx.cache[f"draft_{name}"].json.get("draft_key") == "guide zipped=False"
 
 
 @configurable("simple_item_plugin", validator=SimpleItemPluginOptions)
@@ -23,6 +46,20 @@ def guide(ctx: Context, opts: SimpleItemPluginOptions):
         Guide(ctx, draft, opts).gen()
 
 
+@configurable("simple_item_plugin", validator=SimpleItemPluginOptions)
+def guide_assets(ctx: Context, opts: SimpleItemPluginOptions):
+    """
+    With `background_render`, the textures and fonts of the guide are generated
+    once the background renders are needed, at the end of the build
+    """
+    if not opts.generate_guide or not opts.background_render:
+        return
+    with ctx.generate.draft() as draft:
+        if not opts.disable_guide_cache:
+            draft.cache("guide_assets", "guide")
+        Guide(ctx, draft, opts).gen_background_assets()
+
+
 
 MAX_RENDER_PER_LINE = 6
 MAX_LINES_PER_PAGE = 6
@@ -66,13 +103,160 @@ def convert_text_component(text: MinecraftTextComponentPlus, already_seen: Optio
             already_seen.add(id(part))
             res.extend(convert_text_component(part.to_text_component(), already_seen, max_depht - 1))
     return res
-        
+
+
+# Styles a written book applies to a text component that doesn't set them.
+# Used to reset children when a style is hoisted into the page root.
+DEFAULT_BOOK_STYLE = {"font": "minecraft:default", "color": "black"}
+EVENT_KEYS = ("hover_event", "click_event")
+
+
+def text_component_size(text: MinecraftTextComponent) -> int:
+    return len(json.dumps(text).encode())
+
+
+def is_line_break(part: MinecraftTextComponentBase) -> bool:
+    return isinstance(part, str) and len(part) > 0 and part.strip("\n") == ""
+
+
+def can_merge(left: MinecraftTextComponentBase, right: MinecraftTextComponentBase) -> bool:
+    if isinstance(left, str) and isinstance(right, str):
+        return True
+    if not isinstance(left, dict) or not isinstance(left.get("text"), str) or "extra" in left:
+        return False
+    if is_line_break(right):
+        # line breaks don't depend on the font or the color, only on events
+        return not any(key in left for key in EVENT_KEYS)
+    if not isinstance(right, dict) or not isinstance(right.get("text"), str) or "extra" in right:
+        return False
+    if left.keys() != right.keys():
+        return False
+    return all(left[key] == right[key] for key in left if key != "text")
+
+
+def merge(left: MinecraftTextComponentBase, right: MinecraftTextComponentBase) -> MinecraftTextComponentBase:
+    if isinstance(left, str):
+        assert isinstance(right, str)
+        return left + right
+    right_text = right if isinstance(right, str) else right["text"]
+    return {**left, "text": left["text"] + right_text}
+
+
+def hoist_style(part: MinecraftTextComponentBase, hoisted: dict[str, Any]) -> MinecraftTextComponentBase:
+    if is_line_break(part):
+        return part
+    if isinstance(part, str):
+        part = {"text": part}
+    res = dict(part)
+    for key, value in hoisted.items():
+        if res.get(key) == value:
+            del res[key]
+        elif key not in res:
+            res[key] = DEFAULT_BOOK_STYLE[key]
+    return res
+
+
+def compact_text_component(text: MinecraftTextComponent, hoisted: Optional[dict[str, Any]] = None) -> MinecraftTextComponent:
+    """
+    Merge adjacent text runs sharing the same style and hoist the given styles into the root.
+    The first element of a page is the root of the text component, every other element inherits its style.
+    Never mutates the components of the input, they can be shared between pages.
+    """
+    if len(text) == 0 or text[0] != "":
+        return text
+    hoisted = hoisted or {}
+    res : MinecraftTextComponent = [{"text": "", **hoisted} if hoisted else ""]
+    for part in text[1:]:
+        if hoisted:
+            part = hoist_style(part, hoisted)
+        if part == "" or (isinstance(part, dict) and part.get("text") == "" and part.keys() <= {"text", *DEFAULT_BOOK_STYLE}):
+            continue
+        if len(res) > 1 and can_merge(res[-1], part):
+            res[-1] = merge(res[-1], part)
+        else:
+            res.append(part)
+    return res
+
+
+def compact_page(text: MinecraftTextComponent) -> MinecraftTextComponent:
+    """
+    Try every combination of the most used font and color as the root style, keep the smallest result.
+    """
+    candidates: dict[str, Any] = {}
+    for key in DEFAULT_BOOK_STYLE:
+        values = Counter(part[key] for part in text if isinstance(part, dict) and isinstance(part.get(key), str))
+        if values:
+            candidates[key] = values.most_common(1)[0][0]
+    hoist_candidates = [{key: value} for key, value in candidates.items()]
+    if len(candidates) > 1:
+        hoist_candidates.append(candidates)
+    best = compact_text_component(text)
+    best_size = text_component_size(best)
+    for hoisted in hoist_candidates:
+        compacted = compact_text_component(text, hoisted)
+        if (size := text_component_size(compacted)) < best_size:
+            best, best_size = compacted, size
+    return best
+
+
+
+def normalize_cache_part(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, dict):
+        return {str(normalize_cache_part(k)): normalize_cache_part(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_cache_part(v) for v in value]
+    return value
+
+
+def page_cache_key(*parts: Any) -> str:
+    """
+    Hash the inputs of a page, two pages with the same key convert to the same text component
+    """
+    dumped = json.dumps(normalize_cache_part(parts), sort_keys=True, default=str)
+    return hashlib.sha1(dumped.encode()).hexdigest()
+
+
+def item_cache_part(item: Optional[ItemProtocol]) -> Any:
+    if item is None:
+        return None
+    return [type(item).__name__, item.id, item.char_index, item.page_index, item.minimal_representation]
+
+
+def shaped_recipe_cache_part(recipe: ShapedRecipe) -> Any:
+    return [
+        [[item_cache_part(item) for item in row] for row in recipe.items],
+        item_cache_part(recipe.result[0]),
+        recipe.result[1],
+    ]
+
+
+def smelting_cache_part(recipe: NBTSmelting) -> Any:
+    return [item_cache_part(recipe.item), item_cache_part(recipe.result[0]), recipe.result[1]]
 
 
 def get_char(char: int) -> str:
     return f"\\u{char:04x}".encode().decode("unicode_escape")
 
 
+# Item glyphs are spread over several fonts, a glyph is packed as `font_index << 16 | codepoint`
+# so that the font an item is rendered with travels with its char_index.
+# Each item uses GLYPH_ROWS consecutive codepoints, one per row of the crafting grid.
+# When big slots have their own render size, the GLYPH_ROWS next codepoints are the big variant.
+GLYPH_ROWS = 3
+GLYPH_START = 0xe100
+GLYPH_END = 0xf8f0
+
+
+def glyph_char(glyph: int) -> str:
+    return get_char(glyph & 0xffff)
+
+
+def glyph_font(glyph: int) -> str:
+    return f"{NAMESPACE}:pages_{glyph >> 16}"
+
+
 def image_count(count: int) -> Image.Image:
     """Generate an image showing the result count
     Args:
@@ -102,6 +286,46 @@ def image_count(count: int) -> Image.Image:
 
 
 
+def optimize_png(img: Image.Image) -> bytes:
+    """Smallest lossless png of the image
+    Args:
+        img (Image): The image to encode
+    Returns:
+        bytes: The png, with an exact palette when the image has at most 256 colors,
+        maximum compression and without metadata
+    """
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    buffer = io.BytesIO()
+    img.save(buffer, format="png", optimize=True, icc_profile=None)
+    best = buffer.getvalue()
+    if img.getcolors(256) is not None:
+        # exact palette, Image.quantize may merge close colors of rgba images
+        palette, indexes = np.unique(np.frombuffer(img.tobytes(), dtype=np.uint32), return_inverse=True)
+        palette_rgba = palette.view(np.uint8).reshape(-1, 4)
+        paletted = Image.frombytes("P", img.size, indexes.astype(np.uint8).tobytes())
+        paletted.putpalette(palette_rgba[:, :3].tobytes())
+        buffer = io.BytesIO()
+        paletted.save(buffer, format="png", optimize=True, transparency=palette_rgba[:, 3].tobytes())
+        data = buffer.getvalue()
+        # only kept if it decodes to the exact same pixels
+        if len(data) < len(best) and Image.open(io.BytesIO(data)).convert("RGBA").tobytes() == img.tobytes():
+            best = data
+    return best
+
+
+@dataclass
+class ItemRenderState:
+    """
+    State of a guide build shared by all its item renders
+    """
+    count_to_char: dict[int, int] = field(default_factory=dict)
+    # big slots use their own glyphs
+    big_glyphs: bool = False
+    # rendered fragments shared between every occurrence of the same item render
+    fragments: dict[tuple, MinecraftTextComponentBasePlus] = field(default_factory=dict)
+
+
 @dataclass
 class ItemRender:
     item: Optional[ItemProtocol]
@@ -109,7 +333,7 @@ class ItemRender:
     part: Literal["render", "count", "void"] = "render"
     row: Literal[0, 1, 2] = 0
     count: int = 1
-    count_to_char: dict[int, int] = field(default_factory=dict)
+    state: ItemRenderState = field(default_factory=ItemRenderState)
 
     void_small = "\uf8f1"
     void_big = "\uf8f2\uf8f2"
@@ -120,7 +344,8 @@ class ItemRender:
     def char_item(self) -> str:
         assert self.item
         assert self.item.char_index
-        char_item = get_char(self.item.char_index + self.row)
+        offset = GLYPH_ROWS if self.is_big and self.state.big_glyphs else 0
+        char_item = glyph_char(self.item.char_index + offset + self.row)
         if self.is_big:
             return f"{self.space_big}{char_item}{self.space_big}"
         return f"{self.space_small}{char_item}{self.space_small}"
@@ -134,7 +359,7 @@ class ItemRender:
     @property
     def char_count(self) -> str:
         assert self.count > 1 and self.part == "count", f"Invalid count {self.count} or part {self.part}"
-        char_count = self.count_to_char.get(self.count)
+        char_count = self.state.count_to_char.get(self.count)
         if not char_count:
             raise ValueError(f"Count {self.count} not supported")
         return f"\uf8f0\uf8f0\uf8f0{get_char(char_count)}"
@@ -155,11 +380,32 @@ class ItemRender:
     @property
     def page_font(self) -> str:
         return f"{NAMESPACE}:pages"
+
+    @property
+    def font(self) -> str:
+        if self.part == "render" and self.item and self.item.char_index:
+            return glyph_font(self.item.char_index)
+        return self.page_font
     
     def to_text_component(self) -> MinecraftTextComponentPlus:
         return [self.get_render()]
 
+    @property
+    def fragment_key(self) -> tuple:
+        item_key = None
+        if self.item:
+            item_key = (type(self.item).__name__, self.item.id, self.item.char_index, self.item.page_index)
+        count_char = self.state.count_to_char.get(self.count) if self.part == "count" else None
+        return (item_key, self.part, self.row, self.is_big, self.count, count_char)
+
     def get_render(self) -> MinecraftTextComponentBasePlus:
+        key = self.fragment_key
+        fragments = self.state.fragments
+        if (res := fragments.get(key)) is None:
+            res = fragments[key] = self.build_render()
+        return res
+
+    def build_render(self) -> MinecraftTextComponentBasePlus:
         if (not self.item) or (self.item.minimal_representation.get("id") == "minecraft:air"):
             return {
                 "text": self.char_void,
@@ -169,7 +415,7 @@ class ItemRender:
 
         res = {
             "text": self.text,
-            "font": self.page_font,
+            "font": self.font,
             "color": "white",
             "hover_event": {
                 "action": "show_item", 
@@ -186,7 +432,7 @@ class ItemRender:
 @dataclass
 class ItemRenderWithBackground:
     item: ItemProtocol
-    count_to_char: dict[int, int] 
+    state: ItemRenderState
     space: str = "\uf8f1\uf8f1"
     
 
@@ -211,16 +457,16 @@ class ItemRenderWithBackground:
             "color": "white",
         }
         yield space_2
-        yield ItemRender(item=self.item, is_big=True, part="render", count_to_char=self.count_to_char, row=2)
+        yield ItemRender(item=self.item, is_big=True, part="render", state=self.state, row=2)
         yield "\n"
         yield space_2
-        yield ItemRender(item=self.item, is_big=True, part="count", count=1, count_to_char=self.count_to_char, row=2)
+        yield ItemRender(item=self.item, is_big=True, part="count", count=1, state=self.state, row=2)
         yield "\n\n\n"
 
 @dataclass
 class ShapedRecipeRender:
     recipe: ShapedRecipe
-    count_to_char: dict[int, int]
+    state: ItemRenderState
 
     @property
     def page_font(self) -> str:
@@ -252,7 +498,7 @@ class ShapedRecipeRender:
                         is_big=False,
                         part="render" if partPosition == "up" else "void",
                         row=i,
-                        count_to_char=self.count_to_char,
+                        state=self.state,
                     )
                 # result generation
                 if (i == 0 and partPosition == "down") or (i == 1) or (i == 2 and partPosition == "up"):
@@ -264,7 +510,7 @@ class ShapedRecipeRender:
                         item=result,
                         is_big=True,
                         part="void",
-                        count_to_char=self.count_to_char,
+                        state=self.state,
                     )
                 # render generation
                 if (i == 1):
@@ -274,7 +520,7 @@ class ShapedRecipeRender:
                         is_big=True,
                         part="render" if partPosition == "up" else "count",
                         count=self.recipe.result[1],
-                        count_to_char=self.count_to_char,
+                        state=self.state,
                     )
                 yield "\n"
         yield "\n"
@@ -282,7 +528,7 @@ class ShapedRecipeRender:
 @dataclass
 class NBTSmeltingRender:
     recipe: NBTSmelting
-    count_to_char: dict[int, int]
+    state: ItemRenderState
 
     @property
     def page_font(self) -> str:
@@ -306,7 +552,7 @@ class NBTSmeltingRender:
                 is_big=False,
                 part=part,
                 row=1,
-                count_to_char=self.count_to_char,
+                state=self.state,
             )
             yield "\n"
         for part in ("render", "void"):
@@ -317,7 +563,7 @@ class NBTSmeltingRender:
                 part=part,
                 count=self.recipe.result[1],
                 row=2,
-                count_to_char=self.count_to_char,
+                state=self.state,
             )
             yield "\n"
         yield "\n\n"
@@ -327,10 +573,16 @@ class NBTSmeltingRender:
 @dataclass
 class Page:
     ctx: Context
-    content: MinecraftTextComponentPlus
+    content: MinecraftTextComponentPlus = field(default_factory=list)
     page_index: Optional[int] = None
+    # hash of the inputs of the page, pages without key are always converted
+    cache_key: Optional[str] = None
+    # builds the content when the page is converted, never called when the page is reused from the cache
+    build: Optional[Callable[[], MinecraftTextComponentPlus]] = None
 
     def to_text_component(self) -> MinecraftTextComponentPlus:
+        if self.build is not None:
+            return self.build()
         return self.content
 
 
@@ -339,57 +591,144 @@ class CategoryElement:
     ctx: Context
     icon_char: int
     minimal_representation: dict[str, Any]
-    pages: list[Page]
+    render_state: ItemRenderState
+    crafts: list[ShapedRecipe] = field(default_factory=list)
+    furnaces: list[NBTSmelting] = field(default_factory=list)
+    # recipes using the item, one "used in" page each
+    usages: list[ShapedRecipe | NBTSmelting] = field(default_factory=list)
 
     item: Optional[ItemProtocol] = None
-
-    @property
-    def page_index(self) -> Optional[int]:
-        if len(self.pages) == 0:
-            raise ValueError("No pages")
-        return self.pages[0].page_index
+    # index of the first page, assigned before any page is built
+    page_index: Optional[int] = None
 
     @classmethod
-    def from_item(cls, ctx: Context, item: ItemProtocol, count_to_char: dict[int,int]) -> 'CategoryElement':
-        pages = list(cls.from_item_content(ctx, item, count_to_char))
+    def from_item(cls, ctx: Context, item: ItemProtocol, render_state: ItemRenderState, recipe_index: RecipeIndex, usage_pages: bool = False) -> 'CategoryElement':
         icon_char = item.char_index
         minimal_representation = item.minimal_representation
         assert icon_char is not None, f"Item {item.id} has no char index"
-        return cls(ctx=ctx, icon_char=icon_char, pages=pages, minimal_representation=minimal_representation, item=item)
+        producers = recipe_index.produced_by(item)
+        crafts = [recipe for recipe in producers if isinstance(recipe, ShapedRecipe)]
+        furnaces = [recipe for recipe in producers if isinstance(recipe, NBTSmelting)]
+        usages = recipe_index.used_in(item) if usage_pages else []
+        return cls(
+            ctx=ctx,
+            icon_char=icon_char,
+            minimal_representation=minimal_representation,
+            render_state=render_state,
+            crafts=crafts,
+            furnaces=furnaces,
+            usages=usages,
+            item=item,
+        )
+
+    @property
+    def on_one_page(self) -> bool:
+        return len(self.crafts) + len(self.furnaces) <= 1
+
+    @property
+    def additional_pages(self) -> list[Page]:
+        if self.item is None or not self.item.additional_pages:
+            return []
+        return self.item.additional_pages
+
+    @property
+    def page_count(self) -> int:
+        count = 1
+        if not self.on_one_page:
+            count += -(-len(self.crafts) // 2) + -(-len(self.furnaces) // 2)
+        return count + len(self.usages) + len(self.additional_pages)
+
+    @property
+    def stable_key(self) -> str:
+        if self.item is None:
+            return str(self.icon_char)
+        return self.item.id
+
+    def set_page_index(self, page_index: int):
+        self.page_index = page_index
+        if self.item is not None:
+            self.item.page_index = page_index
+
+    def cache_key(self) -> str:
+        """
+        Hash of everything the pages of the element are built from, computed without building them
+        """
+        assert self.item is not None
+        return page_cache_key(
+            "element",
+            self.page_index,
+            item_cache_part(self.item),
+            self.item.guide_description,
+            [shaped_recipe_cache_part(recipe) for recipe in self.crafts],
+            [smelting_cache_part(recipe) for recipe in self.furnaces],
+            [
+                shaped_recipe_cache_part(recipe) if isinstance(recipe, ShapedRecipe) else smelting_cache_part(recipe)
+                for recipe in self.usages
+            ],
+            self.render_state.count_to_char,
+        )
+
+    @property
+    def description(self) -> TranslatedString:
+        assert self.item is not None
+        return self.item.guide_description or ("", {})
+
+    @property
+    def used_in(self) -> TranslatedString:
+        return (f"{NAMESPACE}.guide.used_in", {
+            Lang.en_us: "Used in",
+            Lang.fr_fr: "Utilisé dans",
+        })
+
+    def export_translations(self):
+        """
+        Translations used by the pages, exported even when the pages are reused from the cache
+        """
+        export_translated_string(self.ctx, self.description)
+        if self.usages:
+            export_translated_string(self.ctx, self.used_in)
+
+    def recipe_render(self, recipe: ShapedRecipe | NBTSmelting) -> MinecraftTextComponentBasePlus:
+        if isinstance(recipe, ShapedRecipe):
+            return ShapedRecipeRender(recipe=recipe, state=self.render_state)
+        return NBTSmeltingRender(recipe=recipe, state=self.render_state)
+
+    def iter_page_builders(self) -> Iterable[Callable[[], MinecraftTextComponentPlus]]:
+        """
+        One function per page building its content, only called when the page isn't reused from the cache
+        """
+        yield self.item_page_content
+        if not self.on_one_page:
+            for recipe_batch in batched(self.crafts, 2):
+                yield partial(self.recipes_page_content, recipe_batch)
+            for recipe_batch in batched(self.furnaces, 2):
+                yield partial(self.recipes_page_content, recipe_batch)
+        for recipe in self.usages:
+            yield partial(self.usage_page_content, recipe)
+
+    def item_page_content(self) -> MinecraftTextComponentPlus:
+        assert self.item is not None
+        item = self.item
+        crafts = self.crafts
+        furnaces = self.furnaces
 
-    @classmethod
-    def from_item_content(cls, ctx: Context, item: ItemProtocol, count_to_char: dict[int,int]) -> Iterable[Page]:
-        crafts = []
-        for recipe in ShapedRecipe.iter_values(ctx):
-            if recipe.result[0] == item:
-                crafts.append(recipe)
-        furnaces = []
-        for recipe in NBTSmelting.iter_values(ctx):
-            if recipe.result[0] == item:
-                furnaces.append(recipe)
-        on_one_page = len(crafts) + len(furnaces) <= 1
-        
         item_name = item.minimal_representation["components"]["minecraft:item_name"]
         item_name = deepcopy(item_name)
         item_name["font"] = f"{NAMESPACE}:medium_font"
         item_name["color"] = "black"
 
-        description = item.guide_description
-        description = description if description else ("",{})
-        export_translated_string(ctx, description)
+        description = self.description
         
         content : MinecraftTextComponentPlus = [""]
         content.append(item_name)
         content.append("\n")
-        if not on_one_page:
-            content.append(ItemRenderWithBackground(item=item, count_to_char=count_to_char))
+        if not self.on_one_page:
+            content.append(ItemRenderWithBackground(item=item, state=self.render_state))
         else:
             content.append("\n")
             craft = crafts[0] if len(crafts) > 0 else furnaces[0] if len(furnaces) > 0 else None
-            if isinstance(craft, ShapedRecipe):
-                content.append(ShapedRecipeRender(recipe=craft, count_to_char=count_to_char))
-            elif isinstance(craft, NBTSmelting):
-                content.append(NBTSmeltingRender(recipe=craft, count_to_char=count_to_char))
+            if craft is not None:
+                content.append(self.recipe_render(craft))
             
         if len(description) > 2:
             content.append({
@@ -404,31 +743,49 @@ class CategoryElement:
                 "color":"black",
                 "fallback": description[1].get(Lang.en_us, "No description"),
             })
-        yield Page(ctx=ctx, content=content)
-        
-        if not on_one_page:
-            for recipe_batch in batched(crafts, 2):
-                content : MinecraftTextComponentPlus = [""]
-                for recipe in recipe_batch:
-                    content.append(ShapedRecipeRender(recipe=recipe, count_to_char=count_to_char))
-                content.append("\n")
-                yield Page(ctx=ctx, content=content)
-            for recipe_batch in batched(furnaces, 2):
-                content : MinecraftTextComponentPlus = [""]
-                for recipe in recipe_batch:
-                    content.append(NBTSmeltingRender(recipe=recipe, count_to_char=count_to_char))
-                content.append("\n")
-                yield Page(ctx=ctx, content=content)
-        yield from item.additional_pages if item.additional_pages else []
+        return content
+
+    def recipes_page_content(self, recipes: Iterable[ShapedRecipe | NBTSmelting]) -> MinecraftTextComponentPlus:
+        content : MinecraftTextComponentPlus = [""]
+        for recipe in recipes:
+            content.append(self.recipe_render(recipe))
+        content.append("\n")
+        return content
+
+    def usage_page_content(self, recipe: ShapedRecipe | NBTSmelting) -> MinecraftTextComponentPlus:
+        # a single recipe per page, the header takes the room of the second one
+        content : MinecraftTextComponentPlus = [""]
+        content.append({
+            "translate": self.used_in[0],
+            "font": f"{NAMESPACE}:medium_font",
+        })
+        content.append("\n")
+        content.append(self.recipe_render(recipe))
+        return content
+
+    def release(self):
+        """
+        Drop the recipes once the pages are converted, the element is only kept for the links to its page
+        """
+        self.crafts = []
+        self.furnaces = []
+        self.usages = []
 
     def to_pages(self, ctx: Context) -> Iterable[Page]:
-        first = True
-        for page in self.pages:
-            page.page_index = ctx.meta["guide_index"]()
-            if self.item is not None and first:
-                first = False
-                self.item.page_index = page.page_index
+        """
+        Pages with their cache key and a lazy content, the page indexes must have been assigned before
+        """
+        assert self.page_index is not None, "Page index not assigned"
+        self.export_translations()
+        element_key = self.cache_key()
+        page_index = self.page_index
+        for build in self.iter_page_builders():
+            yield Page(ctx=ctx, page_index=page_index, cache_key=page_cache_key(element_key, page_index), build=build)
+            page_index += 1
+        for page in self.additional_pages:
+            page.page_index = page_index
             yield page
+            page_index += 1
 
 @dataclass
 class CategoryElementRender:
@@ -443,15 +800,17 @@ class CategoryElementRender:
         return list(self.get_render())
     
     def get_render(self) -> Iterable[MinecraftTextComponentBasePlus]:
-        assert self.category_element.pages[0].page_index
-        char_item = get_char(self.category_element.icon_char)
+        assert self.category_element.page_index
+        char_item = glyph_char(self.category_element.icon_char)
         char_space = "\uf8f3"
         char_item = f"{char_space}{char_item}{char_space}"
+        font = glyph_font(self.category_element.icon_char)
         if self.part == "down":
             char_item = "\uf8f1"
+            font = self.page_font
         yield {
             "text": char_item,
-            "font": self.page_font,
+            "font": font,
             "color": "white",
             "hover_event": {
                 "action": "show_item",
@@ -459,7 +818,7 @@ class CategoryElementRender:
             },
             "click_event": {
                 "action": "change_page",
-                "page": self.category_element.pages[0].page_index,
+                "page": self.category_element.page_index,
             },
         }
             
@@ -474,16 +833,33 @@ class Category:
     icon_char: int
     elements: list[CategoryElement]
     page_index: Optional[int] = None
+    id: Optional[str] = None
+    # set when the guide is split in volumes, the category is then in its own book
+    volume: Optional[int] = None
 
     @classmethod
-    def from_item_group(cls, ctx: Context, item_group: ItemGroup, count_to_char: dict[int,int]) -> 'Category':
+    def from_item_group(cls, ctx: Context, item_group: ItemGroup, render_state: ItemRenderState, recipe_index: RecipeIndex, usage_pages: bool = False) -> 'Category':
         elements : list[CategoryElement] = []
         for item in item_group.items_list:
-            elements.append(CategoryElement.from_item(ctx, item, count_to_char))
+            elements.append(CategoryElement.from_item(ctx, item, render_state, recipe_index, usage_pages))
         assert item_group.item_icon
         icon_char = item_group.item_icon.char_index
         assert icon_char is not None, "Item has no char index"
-        return cls(name=item_group.name, icon_char=icon_char, elements=elements)
+        return cls(name=item_group.name, icon_char=icon_char, elements=elements, id=item_group.id)
+
+    @property
+    def volume_path(self) -> str:
+        return f"{NAMESPACE}:impl/guide/{self.id}"
+
+    @property
+    def page_count(self) -> int:
+        return -(-len(self.elements) // MAX_RENDER_PER_PAGE)
+
+    def assign_page_index(self, guide_index: "AutoIncrement"):
+        if self.page_count == 0:
+            return
+        self.page_index = guide_index()
+        guide_index.value += self.page_count - 1
     
     def to_pages(self, ctx: Context) -> Iterable[Page]:
         for i, elements_in_page in enumerate(batched(self.elements, MAX_RENDER_PER_PAGE)):
@@ -505,10 +881,15 @@ class Category:
                 for element in element_line:
                     content.append(CategoryElementRender(category_element=element, part="down"))
                 content.append("\n")
-            index = ctx.meta["guide_index"]()
-            if i == 0:
-                self.page_index = index
-            yield Page(ctx=ctx, content=content, page_index=index)
+            assert self.page_index is not None, "Page index not assigned"
+            cache_key = page_cache_key(
+                "category",
+                self.page_index + i,
+                self.name,
+                len(self.elements) > MAX_RENDER_PER_PAGE,
+                [[element.icon_char, element.page_index, element.minimal_representation] for element in elements_in_page],
+            )
+            yield Page(ctx=ctx, content=content, page_index=self.page_index + i, cache_key=cache_key)
                 
         
     
@@ -525,25 +906,35 @@ class CategoryRender:
     def to_text_component(self) -> MinecraftTextComponentPlus:
         return list(self.get_render())
     
-    def get_render(self) -> Iterable[MinecraftTextComponentBasePlus]:
+    def get_click_event(self) -> dict[str, Any]:
+        if self.category.volume is not None:
+            return {
+                "action": "run_command",
+                "command": f"/trigger {NAMESPACE}.guide set {self.category.volume}",
+            }
         assert self.category.page_index, "No pages"
-        char_item = get_char(self.category.icon_char)
+        return {
+            "action": "change_page",
+            "page": self.category.page_index,
+        }
+    
+    def get_render(self) -> Iterable[MinecraftTextComponentBasePlus]:
+        char_item = glyph_char(self.category.icon_char)
         char_space = "\uf8f3"
         char_item = f"{char_space}{char_item}{char_space}"
+        font = glyph_font(self.category.icon_char)
         if self.part == "down":
             char_item = "\uf8f1"
+            font = self.page_font
         yield {
             "text": char_item,
-            "font": self.page_font,
+            "font": font,
             "color": "white",
             "hover_event": {
                 "action": "show_text",
                 "contents": {"translate": self.category.name[0]},
             },
-            "click_event": {
-                "action": "change_page",
-                "page": self.category.page_index,
-            },
+            "click_event": self.get_click_event(),
         }
 
 
@@ -553,13 +944,14 @@ class CategoriesPage:
     A page at the beginning of the guide, containing clickable Category
     """
     categories: list[Category]
+    page_index: Optional[int] = None
 
     @classmethod
-    def from_item_groups(cls, ctx: Context, item_groups: Iterable[ItemGroup], count_to_char: dict[int,int]) -> 'CategoriesPage':
+    def from_item_groups(cls, ctx: Context, item_groups: Iterable[ItemGroup], render_state: ItemRenderState, recipe_index: RecipeIndex, usage_pages: bool = False) -> 'CategoriesPage':
         assert len(list(item_groups)) <= MAX_RENDER_PER_PAGE
         categories : list[Category] = []
         for item_group in item_groups:
-            categories.append(Category.from_item_group(ctx, item_group, count_to_char))
+            categories.append(Category.from_item_group(ctx, item_group, render_state, recipe_index, usage_pages))
         return cls(categories=categories)
     
     def to_page(self, ctx: Context) -> Page:
@@ -581,7 +973,13 @@ class CategoriesPage:
             for category in category_line:
                 content.append(CategoryRender(category=category, part="down"))      
             content.append("\n")
-        return Page(ctx=ctx, content=content, page_index=ctx.meta["guide_index"]())
+        cache_key = page_cache_key(
+            "categories",
+            self.page_index,
+            categories,
+            [[category.name, category.icon_char, category.page_index, category.volume] for category in self.categories],
+        )
+        return Page(ctx=ctx, content=content, page_index=self.page_index, cache_key=cache_key)
         
 
 @dataclass
@@ -592,10 +990,10 @@ class CategoriesPages:
     pages: list[CategoriesPage]
 
     @classmethod
-    def from_item_groups(cls, ctx: Context, item_groups: Iterable[ItemGroup], count_to_char: dict[int,int]) -> 'CategoriesPages':
+    def from_item_groups(cls, ctx: Context, item_groups: Iterable[ItemGroup], render_state: ItemRenderState, recipe_index: RecipeIndex, usage_pages: bool = False) -> 'CategoriesPages':
         pages : list[CategoriesPage] = []
         for item_groups_line in batched(item_groups, MAX_RENDER_PER_PAGE):
-            pages.append(CategoriesPage.from_item_groups(ctx, item_groups_line, count_to_char))
+            pages.append(CategoriesPage.from_item_groups(ctx, item_groups_line, render_state, recipe_index, usage_pages))
         return cls(pages=pages)
     
 
@@ -624,26 +1022,178 @@ class Guide:
     debug_mode: bool = False
 
     char_index: int = 0xe000
-    char_offset: int = 0x0004
+    font_index: int = 0
+    glyph_index: int = GLYPH_START
     count_to_char: dict[int, int] = field(default_factory=dict)
     page_count: int = 1
+    bytes_saved: dict[tuple[str, int], int] = field(default_factory=dict)
+    # converted pages of this build, by cache key
+    converted_pages: dict[str, MinecraftTextComponent] = field(default_factory=dict)
+    pages_reused: int = 0
+    # render path -> render path of the first pixel-identical render
+    render_aliases: dict[str, str] = field(default_factory=dict)
+    glyph_by_render: dict[str, int] = field(default_factory=dict)
+    # pages of the item modifiers created, by path
+    modifiers: dict[str, list[MinecraftTextComponent]] = field(default_factory=dict)
+    # glyphs of the previous build, kept by the renders that still exist
+    stable_glyphs: dict[str, int] = field(default_factory=dict)
+    reserved_glyphs: set[int] = field(default_factory=set)
+
+    @cached_property
+    def render_state(self) -> ItemRenderState:
+        return ItemRenderState(count_to_char=self.count_to_char, big_glyphs=self.big_glyphs)
+
+    @property
+    def stable_cache(self) -> dict[str, Any]:
+        """
+        Guide part of the plugin stable_cache.json, glyph and page assignments of the previous build
+        """
+        return self.ctx.meta.setdefault("simple_item_plugin", {}).setdefault("stable_cache", {}).setdefault("guide", {})
 
     @property
     def page_font(self) -> str:
         return f"{NAMESPACE}:pages"
 
-    def get_new_char(self, offset: Optional[int] = None) -> int:
-        offset = offset or self.char_offset
+    def get_new_char(self, offset: int = 1) -> int:
+        """
+        Allocate codepoints in the base font, used for the count glyphs
+        """
         res = self.char_index
         self.char_index += offset
-        assert self.char_index < 0xf8f0, "The guide generator has reached the maximum number of characters"
+        assert self.char_index <= GLYPH_START, "The guide generator has reached the maximum number of characters in the base font"
         return res
 
+    def get_new_glyph(self) -> int:
+        """
+        Allocate the consecutive codepoints of an item, opening a new font when the current one is full
+        """
+        while True:
+            if self.glyph_index + self.glyph_step > GLYPH_END:
+                self.font_index += 1
+                self.glyph_index = GLYPH_START
+            res = self.font_index << 16 | self.glyph_index
+            self.glyph_index += self.glyph_step
+            if res not in self.reserved_glyphs:
+                return res
+
+    def load_stable_glyphs(self, render_paths: set[str]):
+        """
+        Reserve the glyphs of the previous build for the renders that still exist,
+        new renders get the free slots
+        """
+        if self.stable_cache.get("glyph_step", GLYPH_ROWS) != self.glyph_step:
+            return
+        for render_path, glyph in self.stable_cache.get("glyphs", {}).items():
+            codepoint = glyph & 0xffff
+            if (
+                render_path not in render_paths
+                or glyph in self.reserved_glyphs
+                or not GLYPH_START <= codepoint <= GLYPH_END - self.glyph_step
+                or (codepoint - GLYPH_START) % self.glyph_step != 0
+            ):
+                continue
+            self.stable_glyphs[render_path] = glyph
+            self.reserved_glyphs.add(glyph)
+
+    def save_stable_glyphs(self):
+        self.stable_cache["glyphs"] = dict(sorted(self.glyph_by_render.items()))
+        self.stable_cache["glyph_step"] = self.glyph_step
+
+    @staticmethod
+    def render_sizes(opts: SimpleItemPluginOptions) -> tuple[int, int]:
+        """
+        Size of the renders of the small (grid) and big (result) slots
+        """
+        small = opts.guide_render_size or DEFAULT_RENDER_SIZE
+        big = opts.guide_big_render_size or small
+        return small, big
+
+    @property
+    def big_glyphs(self) -> bool:
+        small, big = self.render_sizes(self.opts)
+        return small != big
+
+    @property
+    def glyph_step(self) -> int:
+        return GLYPH_ROWS * 2 if self.big_glyphs else GLYPH_ROWS
+
+    @staticmethod
+    def variant_texture(render_path: str, size: int, render_size: int) -> str:
+        if size == render_size:
+            return render_path
+        return f"{render_path}_{size}px"
+
+    def get_glyph_font(self, glyph: int) -> Font:
+        font_path = glyph_font(glyph)
+        if font_path not in self.draft.assets.fonts:
+            self.draft.assets.fonts[font_path] = Font({
+                "providers": [
+                    {"type": "reference", "id": self.page_font},
+                ],
+            })
+        return self.draft.assets.fonts[font_path]
+
+    @staticmethod
+    def render_items(ctx: Context) -> list[ItemProtocol]:
+        return [
+            *Item.iter_values(ctx), 
+            *ExternalItem.iter_values(ctx), 
+            *VanillaItem.iter_values(ctx),
+            *RecipeItemTag.iter_values(ctx),
+        ]
+
+    @classmethod
+    def request_renders(cls, ctx: Context):
+        """
+        Items are rendered once at the largest size, smaller slots use a downsampled copy
+        """
+        render = ctx.inject(RenderService)
+        render_size = max(cls.render_sizes(ctx.validate("simple_item_plugin", SimpleItemPluginOptions)))
+        for item in cls.render_items(ctx):
+            render.request(
+                item.to_model_resolver(ctx),
+                path_ctx=cls.item_to_render(item),
+                render_size=render_size,
+                shared=isinstance(item, (VanillaItem, RecipeItemTag)),
+            )
+
+    def font_items(self) -> list[ItemProtocol]:
+        return [
+            *Item.iter_values(self.ctx),
+            *ExternalItem.iter_values(self.ctx),
+            *RecipeItemTag.iter_values(self.ctx),
+            *[i for i in VanillaItem.iter_values(self.ctx) if i.id != "minecraft:air"],
+        ]
+
     @staticmethod
     def item_to_render(item: ItemProtocol) -> str:
         if isinstance(item, RecipeItemTag):
             return f"{NAMESPACE}:render/{item.first_item.replace(':', '/')}"
         return f"{NAMESPACE}:render/{item.id.replace(':', '/')}"
+
+    @classmethod
+    def resolve_render(cls, ctx: Context, item: ItemProtocol) -> str:
+        """
+        Render path of the texture actually kept for the item, duplicates point to the same texture
+        """
+        path = cls.item_to_render(item)
+        return ctx.meta.get("simple_item_plugin", {}).get("render_aliases", {}).get(path, path)
+
+    def deduplicate_renders(self):
+        """
+        Keep one texture per unique image, every other render path becomes an alias of it
+        """
+        path_by_hash: dict[str, str] = {}
+        for texture_path in sorted(self.ctx.assets.textures.match(f"{NAMESPACE}:render/**")):
+            img: Image.Image = self.ctx.assets.textures[texture_path].image
+            digest = hashlib.sha1(f"{img.mode}{img.size}".encode() + img.tobytes()).hexdigest()
+            if digest in path_by_hash:
+                self.render_aliases[texture_path] = path_by_hash[digest]
+                del self.ctx.assets.textures[texture_path]
+            else:
+                path_by_hash[digest] = texture_path
+        self.ctx.meta.setdefault("simple_item_plugin", {})["render_aliases"] = self.render_aliases
+        logger.info(f"Guide renders: {len(path_by_hash)} unique textures, {len(self.render_aliases)} duplicates removed")
     
     def add_big_and_medium_font(self):
         big_font_path = pathlib.Path(__file__).parent / "assets" / "guide" / "font" / "big.json"
@@ -723,7 +1273,7 @@ class Guide:
             img.putpixel((img.width - 1, img.height - 1), (137, 137, 137, 255))
             tex_path = f"{NAMESPACE}:item/font/number/{count}"
             self.draft.assets.textures[tex_path] = Texture(img)
-            char_count = self.get_new_char(offset=1)
+            char_count = self.count_to_char[count]
             char_index = f"\\u{char_count:04x}".encode().decode("unicode_escape")
             self.draft.assets.fonts[font_path].data["providers"].append(
                 {
@@ -734,41 +1284,62 @@ class Guide:
                     "chars": [char_index],
                 }
             )
-            self.count_to_char[count] = char_count
 
-    def add_items_to_font(self, *items: ItemProtocol):
-        for item in items:
+    def assign_count_chars(self):
+        for count in range(2, 100):
+            self.count_to_char[count] = self.get_new_char(offset=1)
+
+    def assign_glyphs(self, render_paths: set[str]):
+        """
+        Give a glyph to every item, items with the same render share it
+        """
+        self.load_stable_glyphs(render_paths)
+        for item in self.font_items():
             if item.char_index:
                 continue
             render_path = self.item_to_render(item)
-            if not render_path in self.draft.assets.textures:
+            render_path = self.render_aliases.get(render_path, render_path)
+            if not render_path in render_paths:
                 raise Exception(f"Texture {render_path} not found for item {item}")
-            item.char_index = self.get_new_char()
-            for i in range(3):
-                char_item = f"\\u{item.char_index+i:04x}".encode().decode(
-                    "unicode_escape"
-                )
-                self.draft.assets.fonts[self.page_font].data["providers"].append(
-                    {
-                        "type": "bitmap",
-                        "file": f"{render_path}.png",
-                        "ascent": {0: 8, 1: 7, 2: 6}.get(i),
-                        "height": 16,
-                        "chars": [char_item],
-                    }
-                )
+            if render_path in self.glyph_by_render:
+                item.char_index = self.glyph_by_render[render_path]
+                continue
+            if render_path in self.stable_glyphs:
+                item.char_index = self.stable_glyphs[render_path]
+            else:
+                item.char_index = self.get_new_glyph()
+            self.glyph_by_render[render_path] = item.char_index
+        self.save_stable_glyphs()
+
+    def add_glyphs_to_font(self):
+        small, big = self.render_sizes(self.opts)
+        render_size = max(small, big)
+        sizes = [small, big] if self.big_glyphs else [small]
+        # providers sorted by codepoint, adding an item only adds lines to the font
+        for render_path, glyph in sorted(self.glyph_by_render.items(), key=lambda item: item[1]):
+            render_path = self.render_aliases.get(render_path, render_path)
+            font = self.get_glyph_font(glyph)
+            for variant, size in enumerate(sizes):
+                texture_path = self.variant_texture(render_path, size, render_size)
+                if not texture_path in self.draft.assets.textures:
+                    raise Exception(f"Texture {texture_path} not found for glyph {glyph:x}")
+                for i in range(GLYPH_ROWS):
+                    char_item = glyph_char(glyph + variant * GLYPH_ROWS + i)
+                    font.data["providers"].append(
+                        {
+                            "type": "bitmap",
+                            "file": f"{texture_path}.png",
+                            "ascent": {0: 8, 1: 7, 2: 6}.get(i),
+                            "height": 16,
+                            "chars": [char_item],
+                        }
+                    )
 
-    def to_pages(self) -> Iterable[Page]:
+    def items_on_first_page(self) -> bool:
         item_groups = ItemGroup.iter_values(self.ctx)
-        items_on_first_page = False
-        if (
-            len(list(item_groups)) == 1
-            and list(item_groups)[0].id == "special:all_items"
-        ):
-            items_on_first_page = True
-        self.categories = CategoriesPages.from_item_groups(self.ctx, item_groups, self.count_to_char)
-
-        self.ctx.meta.setdefault("guide_index", AutoIncrement())
+        return len(list(item_groups)) == 1 and list(item_groups)[0].id == "special:all_items"
+
+    def first_page(self, items_on_first_page: bool = False) -> Page:
         first_page_content : MinecraftTextComponentPlus = [""]
         first_page_content.append({
             "translate": f"{NAMESPACE}.name",
@@ -779,65 +1350,417 @@ class Guide:
             "translate": f"{NAMESPACE}.guide.first_page",
         })
         if items_on_first_page:
-            self.ctx.meta["guide_index"].value -= 1
-            pages : list[list[Page]]= []
-            for categories_page in self.categories.pages:
-                for category in categories_page.categories:
-                    pages.append(list(category.to_pages(self.ctx)))
+            assert self.categories
+            categories = list(self.iter_categories())
+            assert len(categories) == 1
+            pages = list(categories[0].to_pages(self.ctx))
             assert len(pages) == 1
-            assert len(pages[0]) == 1
-            page = pages[0][0]
-            first_page_content.extend(page.to_text_component())
+            first_page_content.extend(pages[0].to_text_component())
+        return Page(ctx=self.ctx, content=first_page_content, page_index=1)
 
-        yield Page(ctx=self.ctx, content=first_page_content, page_index=self.ctx.meta["guide_index"]())
+    def iter_categories(self) -> Iterable[Category]:
+        assert self.categories
+        for categories_page in self.categories.pages:
+            yield from categories_page.categories
+
+    def assign_page_indexes(self, items_on_first_page: bool) -> int:
+        """
+        Give every page its index before building any of them,
+        so pages can link to each other while being streamed.
+        Returns the last page of the head of the book
+        """
+        guide_index = AutoIncrement()
+        self.ctx.meta["guide_index"] = guide_index
+        guide_index()
+        if items_on_first_page:
+            # the only category is rendered on the first page
+            for category in self.iter_categories():
+                category.page_index = guide_index.value
+        else:
+            assert self.categories
+            for categories_page in self.categories.pages:
+                categories_page.page_index = guide_index()
+            for category in self.iter_categories():
+                category.assign_page_index(guide_index)
+        elements = [element for category in self.iter_categories() for element in category.elements]
+        self.allocate_element_pages(f"{NAMESPACE}:impl/guide", elements, guide_index.value)
+        return guide_index.value
+
+    def allocate_element_pages(self, book: str, elements: list[CategoryElement], head_end: int):
+        """
+        Elements keep the pages they had in the previous build when they still fit,
+        the others take the first free range after the head of the book (first page, categories),
+        filling the holes left by removed elements first.
+        Once the holes exceed `guide_max_blank_pages`, every element is reassigned without holes
+        """
+        stable_pages = self.stable_cache.setdefault("pages", {})
+        previous = stable_pages.get(book, {})
+        element_start = previous.get("element_start", head_end + 1)
+        previous_elements: dict[str, int] = previous.get("elements", {})
+        if element_start <= head_end:
+            logger.info(f"Guide {book}: the head of the book grew, page assignments are reset")
+            element_start = head_end + 1
+            previous_elements = {}
+
+        taken : list[tuple[int, int]] = []
+        def is_free(start: int, count: int) -> bool:
+            i = bisect.bisect_left(taken, (start, start))
+            if i > 0 and taken[i - 1][1] > start:
+                return False
+            return i == len(taken) or taken[i][0] >= start + count
+
+        def first_fit(count: int) -> int:
+            cursor = element_start
+            for start, end in taken:
+                if start - cursor >= count:
+                    break
+                cursor = max(cursor, end)
+            return cursor
+
+        pending : list[CategoryElement] = []
+        for element in elements:
+            start = previous_elements.get(element.stable_key)
+            if isinstance(start, int) and start >= element_start and is_free(start, element.page_count):
+                element.set_page_index(start)
+                bisect.insort(taken, (start, start + element.page_count))
+            else:
+                pending.append(element)
+        for element in pending:
+            start = first_fit(element.page_count)
+            element.set_page_index(start)
+            bisect.insort(taken, (start, start + element.page_count))
+
+        blank_pages = (taken[-1][1] - element_start if taken else 0) - sum(end - start for start, end in taken)
+        if blank_pages > self.opts.guide_max_blank_pages:
+            logger.info(f"Guide {book}: {blank_pages} blank pages left by removed items, page assignments are reset")
+            cursor = element_start
+            for element in elements:
+                element.set_page_index(cursor)
+                cursor += element.page_count
+
+        stable_pages[book] = {
+            "element_start": element_start,
+            "elements": {element.stable_key: element.page_index for element in elements},
+        }
+
+    def iter_element_pages(self, elements: Iterable[CategoryElement], head_end: int) -> Iterable[Page]:
+        """
+        Pages of the elements in book order, the holes left by removed elements are blank pages.
+        Each element is released once its pages are consumed
+        """
+        cursor = head_end + 1
+        blank_pages = 0
+        for element in sorted(elements, key=lambda element: element.page_index or 0):
+            assert element.page_index is not None, "Page index not assigned"
+            while cursor < element.page_index:
+                yield Page(ctx=self.ctx, content=[""], page_index=cursor, cache_key=page_cache_key("blank"))
+                cursor += 1
+                blank_pages += 1
+            yield from element.to_pages(self.ctx)
+            cursor = element.page_index + element.page_count
+            element.release()
+        if blank_pages:
+            logger.info(f"Guide has {blank_pages} blank pages left by removed items, kept to not move the other pages")
+
+    def to_pages(self) -> Iterable[Page]:
+        item_groups = ItemGroup.iter_values(self.ctx)
+        items_on_first_page = self.items_on_first_page()
+        self.categories = CategoriesPages.from_item_groups(
+            self.ctx, item_groups, self.render_state, RecipeIndex.from_context(self.ctx), self.opts.guide_usage_pages
+        )
+        head_end = self.assign_page_indexes(items_on_first_page)
+
+        yield self.first_page(items_on_first_page)
         
         if not items_on_first_page:
             for categories_page in self.categories.pages:
                 yield categories_page.to_page(self.ctx)
-            for categories_page in self.categories.pages:
-                for category in categories_page.categories:
-                    yield from category.to_pages(self.ctx)
-        for categories_page in self.categories.pages:
-            for category in categories_page.categories:
-                for element in category.elements:
-                    yield from element.to_pages(self.ctx)
+            for category in self.iter_categories():
+                yield from category.to_pages(self.ctx)
+        yield from self.iter_element_pages(
+            (element for category in self.iter_categories() for element in category.elements),
+            head_end,
+        )
+
+    def to_volume_pages(self, category: Category) -> Iterable[Page]:
+        guide_index = AutoIncrement()
+        self.ctx.meta["guide_index"] = guide_index
+        category.assign_page_index(guide_index)
+        self.allocate_element_pages(category.volume_path, category.elements, guide_index.value)
+
+        yield from category.to_pages(self.ctx)
+        yield from self.iter_element_pages(category.elements, guide_index.value)
+
+    def gen_volumes(self, guide: Item):
+        """
+        Split the guide in one book per category.
+        The guide item becomes an index whose categories give or switch to the matching volume,
+        every volume has its own item modifier and loot table.
+        """
+        self.categories = CategoriesPages.from_item_groups(
+            self.ctx, ItemGroup.iter_values(self.ctx), self.render_state, RecipeIndex.from_context(self.ctx), self.opts.guide_usage_pages
+        )
+        categories = list(self.iter_categories())
+        for volume, category in enumerate(categories, start=1):
+            category.volume = volume
+
+        index_pages = [self.first_page()]
+        for i, categories_page in enumerate(self.categories.pages, start=2):
+            categories_page.page_index = i
+            index_pages.append(categories_page.to_page(self.ctx))
+        self.convert_pages(index_pages, f"{NAMESPACE}:impl/guide", self.create_modifier())
+
+        for category in categories:
+            # page indexes are local to a volume, items from other volumes are not clickable
+            for other in categories:
+                for element in other.elements:
+                    if element.item is not None:
+                        element.item.page_index = None
+            self.convert_pages(self.to_volume_pages(category), category.volume_path, self.create_modifier(category.volume_path))
+            self.create_volume_loot_table(category, guide)
+        self.create_volume_selector(categories, guide)
+
+    def create_volume_loot_table(self, category: Category, guide: Item):
+        self.draft.data.loot_tables[category.volume_path] = LootTable({
+            "pools": [
+                {
+                    "rolls": 1,
+                    "entries": [
+                        {
+                            "type": "minecraft:loot_table",
+                            "value": guide.loot_table_path,
+                            "functions": [
+                                {"function": "minecraft:reference", "name": category.volume_path},
+                            ],
+                        }
+                    ],
+                }
+            ]
+        })
+
+    def create_volume_selector(self, categories: list[Category], guide: Item):
+        """
+        The index book runs `/trigger <ns>.guide set <volume>` (the objective is added by the load function),
+        an advancement reacts to the trigger and replaces the guide in hand by the volume (or gives it).
+        """
+        objective = f"{NAMESPACE}.guide"
+        enable_path = f"{NAMESPACE}:impl/guide/enable"
+        open_path = f"{NAMESPACE}:impl/guide/open_volume"
+        is_guide = f'*[minecraft:custom_data~{{smithed:{{id:"{guide.namespace_id(self.ctx)}"}}}}]'
+
+        self.draft.data.advancements[enable_path] = Advancement({
+            "criteria": {
+                "has_guide": {
+                    "trigger": "minecraft:inventory_changed",
+                    "conditions": {
+                        "items": [
+                            {
+                                "items": guide.base_item,
+                                "predicates": {
+                                    "minecraft:custom_data": {"smithed": {"id": guide.namespace_id(self.ctx)}},
+                                },
+                            }
+                        ]
+                    },
+                }
+            },
+            "rewards": {"function": enable_path},
+        })
+        self.draft.data.functions[enable_path] = Function([
+            f"advancement revoke @s only {enable_path}",
+            f"scoreboard players enable @s {objective}",
+        ])
+
+        self.draft.data.advancements[open_path] = Advancement({
+            "criteria": {
+                "trigger": {
+                    "trigger": "minecraft:tick",
+                    "conditions": {
+                        "player": [
+                            {
+                                "condition": "minecraft:entity_scores",
+                                "entity": "this",
+                                "scores": {objective: {"min": 1}},
+                            }
+                        ]
+                    },
+                }
+            },
+            "rewards": {"function": open_path},
+        })
+        open_function = Function([f"advancement revoke @s only {open_path}"])
+        for category in categories:
+            open_function.append(
+                f"execute if score @s {objective} matches {category.volume} if items entity @s weapon.mainhand {is_guide} "
+                f"run loot replace entity @s weapon.mainhand loot {category.volume_path}"
+            )
+            open_function.append(
+                f"execute if score @s {objective} matches {category.volume} unless items entity @s weapon.mainhand {is_guide} "
+                f"run loot give @s loot {category.volume_path}"
+            )
+        open_function.append(f"scoreboard players reset @s {objective}")
+        open_function.append(f"scoreboard players enable @s {objective}")
+        self.draft.data.functions[open_path] = open_function
 
-    
-                
     def gen(self):
         guide = Item.get(self.ctx, "guide")
         if not guide:
             raise Exception("Guide item not found")
-        render = Render(self.ctx)
-        for item in [
-            *Item.iter_values(self.ctx), 
-            *ExternalItem.iter_values(self.ctx), 
-            *VanillaItem.iter_values(self.ctx),
-            *RecipeItemTag.iter_values(self.ctx),
-        ]:
-            item: ItemProtocol
-            render.add_item_task(item.to_model_resolver(self.ctx), path_ctx=self.item_to_render(item))
-        render.run()
+        metrics = self.ctx.inject(GuideMetrics)
+        with metrics.tracing():
+            self.request_renders(self.ctx)
+            if not self.opts.background_render:
+                with metrics.phase("render"):
+                    self.ctx.inject(RenderService).run()
+                with metrics.phase("deduplicate_renders"):
+                    self.deduplicate_renders()
+                render_paths = set(self.ctx.assets.textures.match(f"{NAMESPACE}:render/**"))
+            else:
+                # the renders are still running, glyphs are only shared between items with the same render path
+                render_paths = {self.item_to_render(item) for item in self.font_items()}
+            metrics.count("renders", len(render_paths))
+            with metrics.phase("assign_glyphs"):
+                self.assign_count_chars()
+                self.assign_glyphs(render_paths)
+            metrics.count("glyphs", len(self.glyph_by_render))
+            if not self.opts.background_render:
+                self.gen_assets()
+
+            with metrics.phase("pages"):
+                if self.opts.guide_volumes and not self.items_on_first_page():
+                    self.gen_volumes(guide)
+                else:
+                    self.convert_pages(self.to_pages(), f"{NAMESPACE}:impl/guide", self.create_modifier())
+            self.save_page_cache()
+            # only the converted pages are needed from now on
+            fragment_count = len(self.render_state.fragments)
+            self.render_state.fragments.clear()
+            self.categories = None
+        if metrics.enabled:
+            for pages in self.modifiers.values():
+                metrics.count("pages", len(pages))
+                metrics.count("components", sum(len(page) for page in pages))
+                metrics.count("modifier_bytes", text_component_size(pages))
+            metrics.count("pages_reused", self.pages_reused)
+            metrics.count("item_fragments", fragment_count)
+        metrics.report()
+        logger.debug(f"Guide built {fragment_count} unique item fragments")
+        logger.info(f"Guide reused {self.pages_reused} unchanged pages from the previous build")
+        if self.opts.compact_guide:
+            logger.info(f"Guide compaction saved {sum(self.bytes_saved.values())} bytes over {len(self.bytes_saved)} pages")
+
+    def gen_assets(self):
+        metrics = self.ctx.inject(GuideMetrics)
+        with metrics.phase("textures"):
+            self.gen_render_textures()
+        with metrics.phase("create_font"):
+            self.create_font()
+            self.add_glyphs_to_font()
+        if self.opts.optimize_guide_textures:
+            with metrics.phase("optimize_textures"):
+                self.optimize_textures()
+
+    def gen_render_textures(self):
+        small, big = self.render_sizes(self.opts)
+        render_size = max(small, big)
         for texture_path in self.ctx.assets.textures.match(f"{NAMESPACE}:render/**"):
-            img: Image.Image = self.ctx.assets.textures[texture_path].image
-            img.putpixel((0, 0), (137, 137, 137, 255))
-            img.putpixel((img.width - 1, img.height - 1), (137, 137, 137, 255))
-            self.draft.assets.textures[texture_path] = Texture(img)
-        self.create_font()
-        self.add_items_to_font(*Item.iter_values(self.ctx))
-        self.add_items_to_font(*ExternalItem.iter_values(self.ctx))
-        self.add_items_to_font(*RecipeItemTag.iter_values(self.ctx))
-        self.add_items_to_font(*[i for i in VanillaItem.iter_values(self.ctx) if i.id != "minecraft:air"])
-
-
-        content : list[MinecraftTextComponent] = []
-        pages = list(self.to_pages())
+            render_img: Image.Image = self.ctx.assets.textures[texture_path].image
+            # smallest first, the markers are drawn on the render itself at its own size
+            for size in sorted({small, big}):
+                img = render_img
+                if img.size != (size, size):
+                    img = img.resize((size, size), Image.Resampling.LANCZOS)
+                img.putpixel((0, 0), (137, 137, 137, 255))
+                img.putpixel((img.width - 1, img.height - 1), (137, 137, 137, 255))
+                self.draft.assets.textures[self.variant_texture(texture_path, size, render_size)] = Texture(img)
+
+    def optimize_textures(self):
+        """
+        Replace the textures of the guide by their optimized png,
+        cached by image content so each unique image is only compressed once
+        """
+        cache = self.ctx.cache["simple_item_plugin_png"]
+        saved = 0
+        for texture_path in list(self.draft.assets.textures.keys()):
+            img: Image.Image = self.draft.assets.textures[texture_path].image
+            digest = hashlib.sha1(f"{img.mode}{img.size}".encode() + img.tobytes()).hexdigest()
+            optimized_path = cache.get_path(f"{digest}.png")
+            if not optimized_path.exists():
+                optimized = optimize_png(img)
+                before = io.BytesIO()
+                img.save(before, format="png")
+                saved += len(before.getvalue()) - len(optimized)
+                optimized_path.write_bytes(optimized)
+            self.draft.assets.textures[texture_path] = Texture(source_path=optimized_path)
+        logger.info(f"Guide textures optimized, {saved} bytes saved on the newly compressed images")
+
+    def gen_background_assets(self):
+        """
+        Textures and fonts of the guide from the background renders,
+        the glyphs were given by the guide and saved in the stable cache
+        """
+        metrics = self.ctx.inject(GuideMetrics)
+        with metrics.tracing():
+            with metrics.phase("render"):
+                self.ctx.inject(RenderService).run()
+            with metrics.phase("deduplicate_renders"):
+                self.deduplicate_renders()
+            self.glyph_by_render = dict(self.stable_cache.get("glyphs", {}))
+            if not self.glyph_by_render:
+                logger.warning("No guide glyphs found in the stable cache, the guide fonts will be empty")
+            self.assign_count_chars()
+            self.gen_assets()
+        metrics.report()
+
+    def convert_pages(self, pages: Iterable[Page], book: str, content: list[MinecraftTextComponent]):
+        """
+        Convert the pages as they are produced and write them in the book content,
+        only the converted json is kept alive
+        """
+        page_cache = self.page_cache
+        metrics = self.ctx.inject(GuideMetrics)
         for page in pages:
-            text_component = convert_text_component(page.to_text_component())
+            cache_key = None
+            if page.cache_key:
+                cache_key = page_cache_key(page.cache_key, self.opts.compact_guide, self.big_glyphs)
+            if cache_key and cache_key in page_cache:
+                text_component = page_cache[cache_key]
+                self.pages_reused += 1
+            else:
+                start = time.perf_counter()
+                text_component = convert_text_component(page.to_text_component())
+                metrics.add_time("convert_text_component", time.perf_counter() - start)
+                if self.opts.compact_guide:
+                    start = time.perf_counter()
+                    text_component = self.compact(page, text_component, book)
+                    metrics.add_time("compact", time.perf_counter() - start)
+            if cache_key:
+                self.converted_pages[cache_key] = text_component
             content.append(text_component)
-        self.create_modifier(content)
 
-    def create_modifier(self, pages: list[MinecraftTextComponent]):
+    @property
+    def page_cache(self) -> dict[str, MinecraftTextComponent]:
+        return self.ctx.cache["simple_item_plugin"].json.setdefault("guide_pages", {})
+
+    def save_page_cache(self):
+        """
+        Only keep the pages of this build, so the cache doesn't grow with stale pages
+        """
+        self.ctx.cache["simple_item_plugin"].json["guide_pages"] = self.converted_pages
+
+    def compact(self, page: Page, text_component: MinecraftTextComponent, book: str) -> MinecraftTextComponent:
+        compacted = compact_page(text_component)
+        saved = text_component_size(text_component) - text_component_size(compacted)
+        page_index = page.page_index if page.page_index is not None else len(self.bytes_saved) + 1
+        self.bytes_saved[(book, page_index)] = saved
+        logger.debug(f"Guide {book} page {page_index}: compaction saved {saved} bytes")
+        return compacted
+
+    def create_modifier(self, path: Optional[str] = None) -> list[MinecraftTextComponent]:
+        """
+        Create the book item modifier and return its (empty) pages list to be filled
+        """
+        pages : list[MinecraftTextComponent] = []
         item_modifier = ItemModifier({
             "function": "minecraft:set_components",
             "components": {
@@ -849,5 +1772,6 @@ class Guide:
                 }
             }
         })
-        self.draft.data.item_modifiers[f"{NAMESPACE}:impl/guide"] = item_modifier
-
+        self.draft.data.item_modifiers[path or f"{NAMESPACE}:impl/guide"] = item_modifier
+        self.modifiers[path or f"{NAMESPACE}:impl/guide"] = pages
+        return pages
@@ -8,6 +8,7 @@ from PIL import Image
 from typing import Any, Optional, TYPE_CHECKING, Union, Self
 from typing_extensions import TypedDict, NotRequired, Literal, Optional
 from simple_item_plugin.utils import export_translated_string, SimpleItemPluginOptions, Registry, ItemProtocol
+from simple_item_plugin.versioning.api import PublicApi
 from beet.contrib.vanilla import Vanilla
 from model_resolver import Item as ModelResolverItem
 
@@ -35,9 +36,6 @@ class ItemGroup(Registry):
     items_list: list[ItemProtocol] = field(default_factory=list)
     page_index: Optional[int] = None
 
-    def __hash__(self) -> int:
-        return hash(f"{NAMESPACE}:self.id")
-    
     def add_item(self, ctx: Context, item: ItemProtocol) -> Self:
         # assert that the item is not already in an item group
         for item_group in ItemGroup.iter_values(ctx):
@@ -191,8 +189,12 @@ class Item(Registry):
             },
         )
     
-    def __hash__(self):
-        return hash(f"{NAMESPACE}:self.id")
+    def check_invariants(self):
+        super().check_invariants()
+        if self.item_name is None:
+            raise ValueError(f"Item {self.id} has no name")
+        if not self.base_item.startswith("minecraft:"):
+            raise ValueError(f"Invalid base item {self.base_item} for {self.id}")
     
 
     def result_command(self, count: int, type : str = "block", slot : int = 16) -> str:
@@ -312,6 +314,7 @@ class Item(Registry):
             # init function
             if registry not in ctx.data.functions:
                 ctx.data.functions[registry] = Function("# @public\n\n")
+                real_ctx.inject(PublicApi).register(registry)
             if not post_load_tag in ctx.data.function_tags:
                 ctx.data.function_tags[post_load_tag] = FunctionTag()
             if f"#{registry_tag}" not in ctx.data.function_tags[post_load_tag].data["values"]:
@@ -362,6 +365,7 @@ execute
                 ctx.data.function_tags[chunk_scan_function_tag_id] = FunctionTag()
             if place_function_id not in ctx.data.functions:
                 ctx.data.functions[place_function_id] = Function("# @public\n\n")
+                real_ctx.inject(PublicApi).register(place_function_id)
                 ctx.data.function_tags[chunk_scan_function_tag_id].data["values"].append(place_function_tag_id_call)
             
             ctx.data.functions[place_function_id].append(f"""
@@ -383,6 +387,7 @@ execute
         )
 
         ctx.data.functions.setdefault(internal_function_id, Function("# @public\n\n"))
+        real_ctx.inject(PublicApi).register(internal_function_id)
         
         placement_code = f"setblock ~ ~ ~ {self.block_properties.get_base_block()}"
 
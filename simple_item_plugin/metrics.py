@@ -0,0 +1,102 @@
+from beet import Context
+from simple_item_plugin.utils import SimpleItemPluginOptions
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Iterator
+import json
+import logging
+import pathlib
+import time
+import tracemalloc
+
+logger = logging.getLogger("simple_item_plugin")
+
+
+@dataclass
+class GuideMetrics:
+    """
+    Wall time, peak memory and counts of the guide phases, use `ctx.inject(GuideMetrics)`.
+    Only recorded with the `guide_metrics` option, tracemalloc slows the build down.
+    """
+    ctx: Context
+    phases: dict[str, dict[str, float]] = field(default_factory=dict)
+    counts: dict[str, int] = field(default_factory=dict)
+
+    @cached_property
+    def enabled(self) -> bool:
+        return self.ctx.validate("simple_item_plugin", SimpleItemPluginOptions).guide_metrics
+
+    @contextmanager
+    def tracing(self) -> Iterator[None]:
+        """
+        Trace the memory allocations once for a whole guide build, the phases only read the peaks
+        """
+        if not self.enabled or tracemalloc.is_tracing():
+            yield
+            return
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        `peak_memory` is the peak traced since the start of the build,
+        `peak_memory_increase` how much the phase added over the memory in use when it started
+        """
+        if not self.enabled:
+            yield
+            return
+        tracing = tracemalloc.is_tracing()
+        memory_before = 0
+        if tracing:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            phase = self.phases.setdefault(name, {"seconds": 0.0})
+            phase["seconds"] += duration
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                phase["peak_memory"] = max(phase.get("peak_memory", 0), peak)
+                phase["peak_memory_increase"] = max(phase.get("peak_memory_increase", 0), peak - memory_before)
+
+    def add_time(self, name: str, seconds: float):
+        """
+        Time of a step spread over another phase, like the conversion of each streamed page
+        """
+        if not self.enabled:
+            return
+        phase = self.phases.setdefault(name, {"seconds": 0.0})
+        phase["seconds"] += seconds
+
+    def count(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    @property
+    def report_path(self) -> pathlib.Path:
+        directory = self.ctx.output_directory or self.ctx.directory
+        return pathlib.Path(directory) / "guide_metrics.json"
+
+    def report(self):
+        if not self.enabled:
+            return
+        for name, phase in self.phases.items():
+            peak = ""
+            if "peak_memory" in phase:
+                peak = f", peak {phase['peak_memory'] / 1024 / 1024:.1f} MiB (+{phase['peak_memory_increase'] / 1024 / 1024:.1f} MiB)"
+            logger.info(f"Guide phase {name}: {phase['seconds']:.3f}s{peak}")
+        for name, value in self.counts.items():
+            logger.info(f"Guide {name}: {value}")
+        report: dict[str, Any] = {"phases": self.phases, "counts": self.counts}
+        self.report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.report_path, "w") as f:
+            json.dump(report, f, indent=4)
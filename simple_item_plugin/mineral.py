@@ -1,21 +1,25 @@
 from beet import Context, Texture, ResourcePack, Model
 from dataclasses import dataclass, field
 
-from typing import Any, Literal, get_args, Optional
+from typing import Any, Literal, get_args, Optional, Self
 from typing_extensions import TypedDict, NotRequired
-from simple_item_plugin.utils import export_translated_string, Registry
+from simple_item_plugin.utils import export_translated_string, Registry, ItemProtocol
 from simple_item_plugin.types import Lang, TranslatedString, NAMESPACE
 from simple_item_plugin.item import Item, BlockProperties, ItemGroup
-from simple_item_plugin.crafting import ShapedRecipe, ShapelessRecipe, NBTSmelting, VanillaItem, SimpledrawerMaterial
+from simple_item_plugin.mineral_texture import MineralTextureGenerator, palette_lut
+from simple_item_plugin.crafting import ShapelessRecipe, NBTSmelting, VanillaItem, SimpledrawerMaterial, RecipeTemplate, export_recipe_templates
 
 from PIL import Image
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from enum import Enum
+import copy
 import json
 import pathlib
 import random
 import logging
+import tomllib
+import yaml
 
 logger = logging.getLogger("simple_item_plugin")
 
@@ -321,8 +325,12 @@ class Mineral(Registry):
 
     item_group : Optional[ItemGroup] = None
 
+    # colors from the darkest to the lightest, the missing textures are generated from the mineral_texture_templates
+    palette: Optional[list[str]] = None
+
     def export(self, ctx: Context):
         export_translated_string(ctx, self.name)
+        ctx.inject(MineralTextureGenerator).generate([self])
         self.export_armor(ctx)
         self.export_subitem(ctx)
     
@@ -355,22 +363,19 @@ class Mineral(Registry):
 
 
 
-    def export_subitem(self, ctx: Context):
-        self.item_group = ItemGroup(
-            id=f"{self.id}_group",
-            name=self.name,
-        )
-        for item, item_args in self.overrides.items():
+    def build_subitems(self) -> list[tuple[SubItem, bool]]:
+        """
+        SubItem of each override and whether it is cookable, the overrides are left untouched
+        so the mineral can be exported again
+        """
+        res: list[tuple[SubItem, bool]] = []
+        for item, overrides in self.overrides.items():
+            item_args = dict(overrides)
             item_args["translation"] = get_default_translated_string(item)
             item_args["type"] = item
             item_args["mineral"] = self
-            is_cookable = False
-            if item in ["raw_ore", "ore", "deepslate_ore", "dust"]:
-                is_cookable = True
-            if "is_cookable" in item_args:
-                is_cookable = item_args["is_cookable"]
-                del item_args["is_cookable"]
-            
+            is_cookable = item_args.pop("is_cookable", item in ["raw_ore", "ore", "deepslate_ore", "dust"])
+
             if item in ToolTypeList:
                 subitem = SubItemTool(**item_args)
             elif item in ArmorTypeList:
@@ -382,9 +387,19 @@ class Mineral(Registry):
                 subitem = SubItem(**item_args)
             else:
                 raise ValueError("Invalid item type")
+            res.append((subitem, is_cookable))
+        return res
+
+    def export_subitem(self, ctx: Context):
+        self.item_group = ItemGroup.construct_trusted(
+            id=f"{self.id}_group",
+            name=self.name,
+        )
+        for subitem, is_cookable in self.build_subitems():
             subitem.export(ctx)
-            new_item = Item(
-                id=f"{self.id}_{item}",
+            # the subitem is validated, the item is built from its output
+            new_item = Item.construct_trusted(
+                id=subitem.get_id(),
                 item_name=subitem.get_item_name(self.name),
                 components_extra=subitem.get_components(ctx),
                 base_item=subitem.get_base_item(),
@@ -405,12 +420,26 @@ class Mineral(Registry):
         return self
 
     def get_item(self, ctx: Context, id: str) -> Item:
-        item = Item.get(ctx, f"{self.id}_{id}")
+        item = Item.get(ctx, f"{self.id}_{id}", default=None)
         if item is None:
             raise ValueError(f"Item {id} not found")
         return item
+
+    def recipe_items(self, ctx: Context) -> dict[str, Optional[ItemProtocol]]:
+        """
+        Items of the mineral by type, with the vanilla items used by the recipe templates
+        """
+        res: dict[str, Optional[ItemProtocol]] = {
+            item_type: Item.get(ctx, f"{self.id}_{item_type}", default=None)
+            for item_type in AllItemTypesList
+        }
+        res["stick"] = VanillaItem(id="minecraft:stick").export(ctx)
+        return res
     
-    def generate_crafting_recipes(self, ctx: Context):
+    def generate_crafting_recipes(self, ctx: Context, templates: Optional[list[RecipeTemplate]] = None):
+        """
+        Recipes of the mineral, the shaped ones come from `templates` (MINERAL_RECIPE_TEMPLATES by default)
+        """
         block = self.get_item(ctx, "block")
         raw_ore_block = self.get_item(ctx, "raw_ore_block")
         ingot = self.get_item(ctx, "ingot")
@@ -428,63 +457,23 @@ class Mineral(Registry):
             material_name=f'{json.dumps({"translate": self.name[0]})}',
         ).export(ctx)
 
-        if raw_ore_block and raw_ore and ore and deepslate_ore and dust:
-            SimpledrawerMaterial(
-                block=raw_ore_block,
-                ingot=raw_ore,
-                nugget=None,
-                material_id=f'{NAMESPACE}.{self.id}_raw',
-                material_name=f'{json.dumps({"translate": self.name[0]})}',
-            ).export(ctx)
-
-            ShapedRecipe(
-                items=(
-                    (raw_ore, raw_ore, raw_ore),
-                    (raw_ore, raw_ore, raw_ore),
-                    (raw_ore, raw_ore, raw_ore),
-                ),
-                result=(raw_ore_block, 1),
-            ).export(ctx)
-
-            ShapelessRecipe(
-                items=[(raw_ore_block, 1)],
-                result=(raw_ore, 9),
-            ).export(ctx)
-
-            NBTSmelting(
-                item=raw_ore,
-                result=(ingot, 2),
-                types=["furnace", "blast_furnace"],
-            ).export(ctx)
-
-            NBTSmelting(
-                item=ore,
-                result=(ingot, 1),
-                types=["furnace", "blast_furnace"],
-            ).export(ctx)
-
-            NBTSmelting(
-                item=deepslate_ore,
-                result=(ingot, 1),
-                types=["furnace", "blast_furnace"],
-            ).export(ctx)
-
-        ShapedRecipe(
-            items=(
-                (ingot, ingot, ingot),
-                (ingot, ingot, ingot),
-                (ingot, ingot, ingot),
-            ),
-            result=(block, 1),
+        SimpledrawerMaterial(
+            block=raw_ore_block,
+            ingot=raw_ore,
+            nugget=None,
+            material_id=f'{NAMESPACE}.{self.id}_raw',
+            material_name=f'{json.dumps({"translate": self.name[0]})}',
         ).export(ctx)
 
-        ShapedRecipe(
-            items=(
-                (nugget, nugget, nugget),
-                (nugget, nugget, nugget),
-                (nugget, nugget, nugget),
-            ),
-            result=(ingot, 1),
+        export_recipe_templates(
+            ctx,
+            MINERAL_RECIPE_TEMPLATES if templates is None else templates,
+            [self.recipe_items(ctx)],
+        )
+
+        ShapelessRecipe(
+            items=[(raw_ore_block, 1)],
+            result=(raw_ore, 9),
         ).export(ctx)
 
         ShapelessRecipe(
@@ -497,93 +486,113 @@ class Mineral(Registry):
             result=(ingot, 9),
         ).export(ctx)
 
-        NBTSmelting(
-            item=dust,
-            result=(ingot, 1),
+        NBTSmelting.construct_trusted(
+            item=raw_ore,
+            result=(ingot, 2),
             types=["furnace", "blast_furnace"],
         ).export(ctx)
 
-        stick = VanillaItem(id="minecraft:stick").export(ctx)
-        stick = VanillaItem(id="minecraft:stick").export(ctx)
-
-        if pickaxe := self.get_item(ctx, "pickaxe"):
-            ShapedRecipe(
-                items=(
-                    (ingot, ingot, ingot),
-                    (None, stick, None),
-                    (None, stick, None),
-                ),
-                result=(pickaxe, 1),
-            ).export(ctx)
-        if axe := self.get_item(ctx, "axe"):
-            ShapedRecipe(
-                items=(
-                    (ingot, ingot, None),
-                    (ingot, stick, None),
-                    (None, stick, None),
-                ),
-                result=(axe, 1),
-            ).export(ctx)
-        if shovel := self.get_item(ctx, "shovel"):
-            ShapedRecipe(
-                items=(
-                    (ingot, None, None),
-                    (stick, None, None),
-                    (stick, None, None),
-                ),
-                result=(shovel, 1),
-            ).export(ctx)
-        if hoe := self.get_item(ctx, "hoe"):
-            ShapedRecipe(
-                items=(
-                    (ingot, ingot, None),
-                    (None, stick, None),
-                    (None, stick, None),
-                ),
-                result=(hoe, 1),
-            ).export(ctx)
-        if sword := self.get_item(ctx, "sword"):
-            ShapedRecipe(
-                items=(
-                    (ingot, None, None),
-                    (ingot, None, None),
-                    (stick, None, None),
-                ),
-                result=(sword, 1),
-            ).export(ctx)
-        if helmet := self.get_item(ctx, "helmet"):
-            ShapedRecipe(
-                items=(
-                    (ingot, ingot, ingot),
-                    (ingot, None, ingot),
-                    (None, None, None),
-                ),
-                result=(helmet, 1),
-            ).export(ctx)
-        if chestplate := self.get_item(ctx, "chestplate"):
-            ShapedRecipe(
-                items=(
-                    (ingot, None, ingot),
-                    (ingot, ingot, ingot),
-                    (ingot, ingot, ingot),
-                ),
-                result=(chestplate, 1),
-            ).export(ctx)
-        if leggings := self.get_item(ctx, "leggings"):
-            ShapedRecipe(
-                items=(
-                    (ingot, ingot, ingot),
-                    (ingot, None, ingot),
-                    (ingot, None, ingot),
-                ),
-                result=(leggings, 1),
-            ).export(ctx)
-        if boots := self.get_item(ctx, "boots"):
-            ShapedRecipe(
-                items=(
-                    (ingot, None, ingot),
-                    (ingot, None, ingot),
-                    (None, None, None),
-                ),
-                result=(boots, 1),
+        for item in (ore, deepslate_ore, dust):
+            NBTSmelting.construct_trusted(
+                item=item,
+                result=(ingot, 1),
+                types=["furnace", "blast_furnace"],
             ).export(ctx)
+
+
+# shaped recipes of every mineral, append a template to add it to all of them
+MINERAL_RECIPE_TEMPLATES: list[RecipeTemplate] = [
+    RecipeTemplate("RRR/RRR/RRR", {"R": "raw_ore"}, "raw_ore_block"),
+    RecipeTemplate("III/III/III", {"I": "ingot"}, "block"),
+    RecipeTemplate("NNN/NNN/NNN", {"N": "nugget"}, "ingot"),
+    RecipeTemplate("III/.S./.S.", {"I": "ingot", "S": "stick"}, "pickaxe"),
+    RecipeTemplate("II./IS./.S.", {"I": "ingot", "S": "stick"}, "axe"),
+    RecipeTemplate("I../S../S..", {"I": "ingot", "S": "stick"}, "shovel"),
+    RecipeTemplate("II./.S./.S.", {"I": "ingot", "S": "stick"}, "hoe"),
+    RecipeTemplate("I../I../S..", {"I": "ingot", "S": "stick"}, "sword"),
+    RecipeTemplate("III/I.I/...", {"I": "ingot"}, "helmet"),
+    RecipeTemplate("I.I/III/III", {"I": "ingot"}, "chestplate"),
+    RecipeTemplate("III/I.I/I.I", {"I": "ingot"}, "leggings"),
+    RecipeTemplate("I.I/I.I/...", {"I": "ingot"}, "boots"),
+]
+
+class MineralSpec(BaseModel):
+    """
+    Immutable description of a mineral, one entry of a MineralCatalog
+    """
+    model_config = ConfigDict(frozen=True)
+    id: str
+    name: TranslatedString
+    overrides: dict[AllItemTypes, dict[str, Any]] = {}
+    armor_additional_attributes: dict[str, AttributeModifier] = {}
+    palette: Optional[tuple[str, ...]] = None
+
+    def to_mineral(self) -> Mineral:
+        return Mineral(
+            id=self.id,
+            name=self.name,
+            overrides=copy.deepcopy(self.overrides),
+            armor_additional_attributes=copy.deepcopy(self.armor_additional_attributes),
+            palette=list(self.palette) if self.palette else None,
+        )
+
+
+@dataclass(frozen=True)
+class MineralCatalog:
+    """
+    Minerals loaded from a toml, json or yaml file, with a `minerals` list of MineralSpec.
+    The whole table is validated on load and every error is reported at once,
+    the catalog can be kept and exported to several contexts.
+    """
+    minerals: tuple[MineralSpec, ...]
+
+    @classmethod
+    def load(cls, path: str | pathlib.Path) -> Self:
+        path = pathlib.Path(path)
+        match path.suffix:
+            case ".toml":
+                with open(path, "rb") as f:
+                    data = tomllib.load(f)
+            case ".json":
+                with open(path) as f:
+                    data = json.load(f)
+            case ".yaml" | ".yml":
+                with open(path) as f:
+                    data = yaml.safe_load(f)
+            case _:
+                raise ValueError(f"Unsupported mineral catalog format {path}")
+        return cls.from_data(data)
+
+    @classmethod
+    def from_data(cls, data: Any) -> Self:
+        entries = data.get("minerals", []) if isinstance(data, dict) else data
+        specs: list[MineralSpec] = []
+        errors: list[str] = []
+        seen: set[str] = set()
+        for index, entry in enumerate(entries):
+            name = entry.get("id", index) if isinstance(entry, dict) else index
+            try:
+                spec = MineralSpec.model_validate(entry)
+                # validates the overrides against the SubItem models without exporting anything
+                spec.to_mineral().build_subitems()
+                if spec.palette is not None:
+                    palette_lut(spec.palette)
+            except ValueError as e:
+                errors.append(f"{name}: {e}")
+                continue
+            if spec.id in seen:
+                errors.append(f"{name}: duplicated mineral")
+                continue
+            seen.add(spec.id)
+            specs.append(spec)
+        if errors:
+            raise ValueError("Invalid mineral catalog\n" + "\n".join(errors))
+        return cls(minerals=tuple(specs))
+
+    def export(self, ctx: Context) -> list[Mineral]:
+        res = [spec.to_mineral() for spec in self.minerals]
+        # one batch for the textures of the whole catalog
+        ctx.inject(MineralTextureGenerator).generate(res)
+        for mineral in res:
+            mineral.export(ctx)
+        return res
@@ -0,0 +1,187 @@
+from beet import Context, Texture
+from simple_item_plugin.types import NAMESPACE
+from simple_item_plugin.utils import SimpleItemPluginOptions
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import TYPE_CHECKING, Iterable, Optional
+from PIL import Image
+import numpy as np
+import hashlib
+import json
+import logging
+import pathlib
+import re
+
+if TYPE_CHECKING:
+    from simple_item_plugin.mineral import Mineral
+
+logger = logging.getLogger("simple_item_plugin")
+
+COLOR_PAT = re.compile(r"^#[0-9a-fA-F]{6}$")
+
+
+def palette_lut(palette: Iterable[str]) -> np.ndarray:
+    """
+    Gradient map of a palette, from the darkest to the lightest color, as a (256, 3) lookup table
+    """
+    palette = list(palette)
+    for color in palette:
+        if not COLOR_PAT.match(color):
+            raise ValueError(f"Invalid palette color {color}, expected #rrggbb")
+    if not palette:
+        raise ValueError("Empty palette")
+    colors = np.array([[int(color[i:i + 2], 16) for i in (1, 3, 5)] for color in palette], dtype=np.float32)
+    positions = np.linspace(0, 255, len(colors))
+    levels = np.arange(256)
+    lut = np.stack([np.interp(levels, positions, colors[:, channel]) for channel in range(3)], axis=-1)
+    return lut.round().astype(np.uint8)
+
+
+@dataclass
+class TextureTemplate:
+    """
+    Grayscale template recolored with the palette of each mineral.
+    `<name>_base.png` is drawn below the recolored template without being recolored, like the stone of an ore.
+    """
+    name: str
+    digest: str
+    luminance: np.ndarray
+    alpha: np.ndarray
+    base: Optional[np.ndarray] = None
+    mcmeta: Optional[dict] = None
+
+    @classmethod
+    def load(cls, directory: pathlib.Path, name: str) -> Optional["TextureTemplate"]:
+        path = directory / f"{name}.png"
+        if not path.exists():
+            return None
+        hasher = hashlib.sha1(path.read_bytes())
+        with Image.open(path) as img:
+            rgba = np.asarray(img.convert("RGBA"))
+        base = None
+        base_path = directory / f"{name}_base.png"
+        if base_path.exists():
+            hasher.update(base_path.read_bytes())
+            with Image.open(base_path) as img:
+                base = np.asarray(img.convert("RGBA"))
+            if base.shape != rgba.shape:
+                raise ValueError(f"{base_path} and {path} have different sizes")
+        mcmeta = None
+        mcmeta_path = directory / f"{name}.png.mcmeta"
+        if mcmeta_path.exists():
+            mcmeta = json.loads(mcmeta_path.read_text())
+        return cls(
+            name=name,
+            digest=hasher.hexdigest(),
+            # ITU-R 601 luma, same as PIL "L" mode
+            luminance=(rgba[..., :3].astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)).round().astype(np.uint8),
+            alpha=rgba[..., 3],
+            base=base,
+            mcmeta=mcmeta,
+        )
+
+    def apply(self, luts: np.ndarray) -> np.ndarray:
+        """
+        Recolor the template with every lookup table at once, (n, 256, 3) -> (n, height, width, 4)
+        """
+        rgb = luts[:, self.luminance].astype(np.float32)
+        alpha = np.broadcast_to(self.alpha[None, ..., None], (*rgb.shape[:3], 1)).astype(np.float32) / 255
+        if self.base is None:
+            return np.concatenate([rgb, alpha * 255], axis=-1).round().astype(np.uint8)
+        base_rgb = self.base[None, ..., :3].astype(np.float32)
+        base_alpha = self.base[None, ..., 3:].astype(np.float32) / 255
+        out_alpha = alpha + base_alpha * (1 - alpha)
+        out_rgb = (rgb * alpha + base_rgb * base_alpha * (1 - alpha)) / np.maximum(out_alpha, 1e-6)
+        out_alpha = np.broadcast_to(out_alpha, alpha.shape)
+        return np.concatenate([out_rgb, out_alpha * 255], axis=-1).round().astype(np.uint8)
+
+
+@dataclass
+class MineralTextureGenerator:
+    """
+    Generate the missing textures of the minerals with a palette from the grayscale templates
+    of the `mineral_texture_templates` directory, use `ctx.inject(MineralTextureGenerator)`.
+    Templates are named after the item types (`ingot.png`, `ore.png`...), `humanoid.png` and `humanoid_leggings.png`
+    are used for the armor equipment. Blocks without `all_same_faces` use `<type>_top.png`, `<type>_side.png`,
+    `<type>_bottom.png` and `<type>_front.png`, or `<type>.png` for the missing faces.
+    Generated textures are cached by template and palette.
+    """
+    ctx: Context
+    templates: dict[str, Optional[TextureTemplate]] = field(default_factory=dict)
+
+    @cached_property
+    def directory(self) -> Optional[pathlib.Path]:
+        opts = self.ctx.validate("simple_item_plugin", SimpleItemPluginOptions)
+        if not opts.mineral_texture_templates:
+            return None
+        return self.ctx.directory / opts.mineral_texture_templates
+
+    def get_template(self, name: str) -> Optional[TextureTemplate]:
+        if name not in self.templates:
+            assert self.directory
+            self.templates[name] = TextureTemplate.load(self.directory, name)
+        return self.templates[name]
+
+    def find_template(self, names: Iterable[str]) -> Optional[TextureTemplate]:
+        for name in names:
+            if (template := self.get_template(name)) is not None:
+                return template
+        return None
+
+    def targets(self, mineral: "Mineral") -> Iterable[tuple[tuple[str, ...], str]]:
+        """
+        (template names by preference, texture path) of the textures used by the items of the mineral,
+        one texture per face for the blocks without `all_same_faces`, like their model
+        """
+        from simple_item_plugin.mineral import ArmorTypeList, BlockTypeList
+
+        for subitem, _ in mineral.build_subitems():
+            item_type = subitem.type
+            if item_type not in BlockTypeList:
+                yield (item_type,), f"{NAMESPACE}:item/{subitem.get_id()}"
+            elif subitem.block_properties and subitem.block_properties.all_same_faces:
+                yield (item_type,), f"{NAMESPACE}:block/{subitem.get_id()}"
+            else:
+                for face in ("top", "side", "bottom", "front"):
+                    yield (f"{item_type}_{face}", item_type), f"{NAMESPACE}:block/{subitem.get_id()}_{face}"
+        if any(item_type in ArmorTypeList for item_type in mineral.overrides):
+            for layer in ("humanoid", "humanoid_leggings"):
+                yield (layer,), f"{NAMESPACE}:entity/equipment/{layer}/{mineral.id}"
+
+    def cache_path(self, template: TextureTemplate, palette: list[str]) -> pathlib.Path:
+        key = hashlib.sha1(json.dumps([template.digest, [color.lower() for color in palette]]).encode()).hexdigest()
+        return self.ctx.cache["simple_item_plugin_texture"].get_path(f"{key}.png")
+
+    def generate(self, minerals: Iterable["Mineral"]):
+        """
+        Generate the textures of all the minerals, one vectorized pass per template
+        """
+        if self.directory is None:
+            return
+        batches: dict[str, list[tuple[str, list[str], pathlib.Path]]] = {}
+        generated = 0
+        for mineral in minerals:
+            if not mineral.palette:
+                continue
+            for names, path in self.targets(mineral):
+                if path in self.ctx.assets.textures:
+                    continue
+                template = self.find_template(names)
+                if template is None:
+                    continue
+                cache_path = self.cache_path(template, mineral.palette)
+                if cache_path.exists():
+                    self.ctx.assets.textures[path] = Texture(source_path=cache_path, mcmeta=template.mcmeta)
+                    continue
+                batches.setdefault(template.name, []).append((path, mineral.palette, cache_path))
+
+        for name, batch in batches.items():
+            template = self.get_template(name)
+            assert template
+            luts = np.stack([palette_lut(palette) for _, palette, _ in batch])
+            for (path, _, cache_path), pixels in zip(batch, template.apply(luts)):
+                Image.fromarray(pixels).save(cache_path)
+                self.ctx.assets.textures[path] = Texture(source_path=cache_path, mcmeta=template.mcmeta)
+                generated += 1
+        if generated:
+            logger.info(f"Generated {generated} mineral textures")
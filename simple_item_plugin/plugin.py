@@ -3,13 +3,13 @@ from beet import Context, configurable, Function, TextFile
 from simple_item_plugin.crafting import ExternalItem, VanillaItem
 from simple_item_plugin.types import NAMESPACE, AUTHOR
 from simple_item_plugin.utils import export_translated_string, Lang, SimpleItemPluginOptions, logger
-from simple_item_plugin.guide import Guide, guide
+from simple_item_plugin.guide import Guide, guide, guide_assets, draft_cached
 from simple_item_plugin.versioning import beet_default as versioning
 from simple_item_plugin.item import Item
 from mecha import beet_default as mecha
 import json
 import pathlib
-from model_resolver.render import Render
+from simple_item_plugin.render import RenderService
 
 
 
@@ -35,20 +35,33 @@ def beet_default(ctx: Context, opts: SimpleItemPluginOptions):
         ctx.data.extra[path.name] = TextFile(open(path, "r").read())
 
     ctx.data.functions.setdefault(opts.load_function).prepend(f"scoreboard objectives add {NAMESPACE}.math dummy")
+    if opts.generate_guide and opts.guide_volumes:
+        # the index book of the guide opens a volume with this trigger
+        ctx.data.functions.setdefault(opts.load_function).prepend(f"scoreboard objectives add {NAMESPACE}.guide trigger")
     
     yield
-    ctx.require(guide)
-    if opts.add_give_all_function:
-        ctx.data.functions[f"{NAMESPACE}:impl/give_all"] = Function()
-        for item in Item.iter_values(ctx):
-            ctx.data.functions[f"{NAMESPACE}:impl/give_all"].append(
-                f"loot give @s loot {item.loot_table_path}"
-            )
-    ctx.require(versioning)
-    ctx.require("beet.contrib.render")
-    ctx.require(mecha)
-    ctx.require("weld_deps.contrib.mecha_auto_include.pipeline")
-    ctx.require("weld_deps")
+    render = ctx.inject(RenderService)
+    if opts.generate_guide and opts.background_render and not draft_cached(ctx, opts, "guide_assets"):
+        # the registry is complete, the renders run during the rest of the build
+        Guide.request_renders(ctx)
+        render.start()
+    try:
+        ctx.require(guide)
+        if opts.add_give_all_function:
+            ctx.data.functions[f"{NAMESPACE}:impl/give_all"] = Function()
+            for item in Item.iter_values(ctx):
+                ctx.data.functions[f"{NAMESPACE}:impl/give_all"].append(
+                    f"loot give @s loot {item.loot_table_path}"
+                )
+        ctx.require(versioning)
+        ctx.require("beet.contrib.render")
+        ctx.require(mecha)
+        ctx.require("weld_deps.contrib.mecha_auto_include.pipeline")
+        ctx.require("weld_deps")
+        ctx.require(guide_assets)
+    finally:
+        # never leave the worker running, its errors are raised here
+        render.join()
 
 
     if ctx.meta["simple_item_plugin"]["stable_cache"]:
@@ -68,11 +81,9 @@ def beet_default(ctx: Context, opts: SimpleItemPluginOptions):
         if item is None:
             logger.warning(f"Item {opts.item_for_pack_png} not found, using default pack.png")
             return
-        path = Guide.item_to_render(item)
-        if not path in ctx.assets.textures:
-            render = Render(ctx)
-            render.add_item_task(item.to_model_resolver(ctx), path_ctx=path)
-            render.run()
-        tex = ctx.assets.textures[path]
+        path = Guide.resolve_render(ctx, item)
+        render = ctx.inject(RenderService)
+        render.request(item.to_model_resolver(ctx), path_ctx=path, shared=isinstance(item, VanillaItem))
+        tex = render.get(path)
         ctx.data.extra["pack.png"] = tex
         ctx.assets.extra["pack.png"] = tex
\ No newline at end of file
@@ -0,0 +1,221 @@
+from beet import Context, Texture, Model, ItemModel, Atlas, Blockstate, LATEST_MINECRAFT_VERSION
+from model_resolver import Item as ModelResolverItem, ModelResolverOptions
+from model_resolver.render import Render
+from model_resolver.utils import DEFAULT_RENDER_SIZE
+from simple_item_plugin.types import NAMESPACE
+from simple_item_plugin.utils import SimpleItemPluginOptions
+from dataclasses import dataclass, field
+from functools import cached_property
+from importlib.metadata import version
+from typing import Optional
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import sys
+import threading
+
+logger = logging.getLogger("simple_item_plugin")
+
+
+@dataclass
+class RenderRequest:
+    item: ModelResolverItem
+    path_ctx: str
+    render_size: int = DEFAULT_RENDER_SIZE
+    # only depends on the vanilla assets, can be stored in the shared cache
+    shared: bool = False
+
+
+@dataclass
+class RenderService:
+    """
+    Render service shared by every plugin of the context, use `ctx.inject(RenderService)`.
+    Requests are queued and rendered in one batch by `run`,
+    renders are stored in the project cache and reused by the next builds.
+    """
+    ctx: Context
+    queue: dict[str, RenderRequest] = field(default_factory=dict)
+    rendered: set[str] = field(default_factory=set)
+    # path_ctx -> (temporary file of the renderer, cache file)
+    pending: dict[str, tuple[pathlib.Path, pathlib.Path]] = field(default_factory=dict)
+    worker: Optional[threading.Thread] = None
+    worker_error: Optional[BaseException] = None
+
+    def request(self, item: ModelResolverItem, path_ctx: str, render_size: Optional[int] = None, shared: bool = False):
+        """
+        Queue a render to `ctx.assets.textures[path_ctx]`, nothing is done if the texture already exists.
+        `shared` is for renders of vanilla items, they are stored in the cache shared between projects
+        """
+        if path_ctx in self.rendered or path_ctx in self.queue or path_ctx in self.ctx.assets.textures:
+            return
+        self.queue[path_ctx] = RenderRequest(
+            item=item,
+            path_ctx=path_ctx,
+            render_size=render_size or DEFAULT_RENDER_SIZE,
+            shared=shared,
+        )
+
+    def get(self, path_ctx: str) -> Texture:
+        """
+        Texture of a render, running the queue if it is still pending
+        """
+        if path_ctx in self.queue or path_ctx in self.pending:
+            self.run()
+        return self.ctx.assets.textures[path_ctx]
+
+    @cached_property
+    def assets_fingerprint(self) -> str:
+        """
+        Hash of the assets a render can depend on, the renders of the plugin itself are excluded
+        """
+        hasher = hashlib.sha1()
+        hasher.update(json.dumps(self.ctx.meta.get("model_resolver", {}), sort_keys=True, default=str).encode())
+        for file_type in (Model, ItemModel, Blockstate, Atlas, Texture):
+            container = self.ctx.assets[file_type]
+            for path in sorted(container.keys()):
+                if path.startswith(f"{NAMESPACE}:render/"):
+                    continue
+                content = container[path].ensure_serialized()
+                hasher.update(path.encode())
+                hasher.update(content if isinstance(content, bytes) else content.encode())
+        return hasher.hexdigest()
+
+    @cached_property
+    def shared_cache_directory(self) -> Optional[pathlib.Path]:
+        """
+        Directory of the renders shared by every project,
+        one sub directory per minecraft version and render parameters
+        """
+        opts = self.ctx.validate("simple_item_plugin", SimpleItemPluginOptions)
+        if not opts.shared_render_cache or os.environ.get("SIMPLE_ITEM_PLUGIN_SHARED_RENDER_CACHE") == "0":
+            return None
+        for file_type in (Model, ItemModel, Blockstate, Atlas, Texture):
+            if any(path.startswith("minecraft:") for path in self.ctx.assets[file_type].keys()):
+                logger.info("The project overrides minecraft assets, the shared render cache is disabled")
+                return None
+        if opts.shared_render_cache_path:
+            root = pathlib.Path(opts.shared_render_cache_path)
+        else:
+            cache_home = os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache"
+            root = pathlib.Path(cache_home) / "simple_item_plugin" / "renders"
+        resolver_opts = self.ctx.validate("model_resolver", ModelResolverOptions)
+        # same version as the vanilla assets model_resolver renders with
+        minecraft_version = getattr(resolver_opts, "minecraft_version", None)
+        if minecraft_version == "latest":
+            minecraft_version = LATEST_MINECRAFT_VERSION
+        if not isinstance(minecraft_version, str) or not minecraft_version:
+            logger.warning("The minecraft version of model_resolver is unknown, the shared render cache is disabled")
+            return None
+        params = json.dumps([
+            version("model_resolver"),
+            resolver_opts.model_dump(mode="json", exclude={"use_cache", "minecraft_version"}),
+        ], sort_keys=True)
+        directory = root / minecraft_version / hashlib.sha1(params.encode()).hexdigest()[:16]
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    def request_key(self, request: RenderRequest) -> str:
+        item = request.item.model_dump(mode="json", by_alias=True, exclude={"default_components"})
+        # custom data has no effect on the render
+        item.get("components", {}).pop("minecraft:custom_data", None)
+        parts = [item, request.render_size]
+        if not self.is_shared(request):
+            parts.append(self.assets_fingerprint)
+        dumped = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha1(dumped.encode()).hexdigest()
+
+    def is_shared(self, request: RenderRequest) -> bool:
+        if not request.shared or not request.item.id.startswith("minecraft:"):
+            return False
+        return self.shared_cache_directory is not None
+
+    def cache_path(self, request: RenderRequest, key: str) -> pathlib.Path:
+        if self.is_shared(request):
+            assert self.shared_cache_directory
+            return self.shared_cache_directory / f"{key}.png"
+        return self.ctx.cache["simple_item_plugin_render"].get_path(f"{key}.png")
+
+    def prepare(self) -> Optional[Render]:
+        """
+        Load the cached renders and create the renderer of the others, on the main thread.
+        The renders are saved to temporary files, `finish` moves them to the cache and the context
+        """
+        render: Optional[Render] = None
+        cached = 0
+        for path_ctx, request in self.queue.items():
+            cached_path = self.cache_path(request, self.request_key(request))
+            if cached_path.exists():
+                self.ctx.assets.textures[path_ctx] = Texture(source_path=cached_path)
+                cached += 1
+                continue
+            if render is None:
+                render = Render(self.ctx)
+            # other projects may read the shared cache at the same time, the file is moved once complete.
+            # the renderer saves without an explicit format, the temporary file must end with .png
+            tmp_path = cached_path.with_name(f"{cached_path.stem}.{os.getpid()}.tmp.png")
+            render.add_item_task(request.item, path_save=tmp_path, render_size=request.render_size)
+            self.pending[path_ctx] = (tmp_path, cached_path)
+        logger.info(f"Render service: {cached} renders from cache, {len(self.queue) - cached} to render")
+        if render is not None:
+            # the merged packs are built here, the renderer doesn't read the context afterwards
+            render.getter.assets
+            render.getter.data
+        self.rendered.update(self.queue)
+        self.queue.clear()
+        return render
+
+    def finish(self):
+        for path_ctx, (tmp_path, cached_path) in self.pending.items():
+            if not tmp_path.exists():
+                # animated items are saved as several files
+                logger.warning(f"Render of {path_ctx} not found")
+                continue
+            os.replace(tmp_path, cached_path)
+            self.ctx.assets.textures[path_ctx] = Texture(source_path=cached_path)
+        self.pending.clear()
+
+    def run(self):
+        self.join()
+        if not self.queue:
+            return
+        render = self.prepare()
+        if render is not None:
+            render.run()
+        self.finish()
+
+    def start(self):
+        """
+        Render the queue in a background thread, `join` (or `run` and `get`) waits for it.
+        OpenGL contexts can't be created outside the main thread on macOS,
+        the queue is left for `run` there
+        """
+        self.join()
+        if not self.queue:
+            return
+        if sys.platform == "darwin":
+            logger.info("Background rendering is not supported on macOS, the renders run on the main thread")
+            return
+        render = self.prepare()
+        if render is None:
+            return
+
+        def target():
+            try:
+                render.run()
+            except BaseException as error:
+                self.worker_error = error
+
+        self.worker = threading.Thread(target=target, name="simple_item_plugin_render", daemon=True)
+        self.worker.start()
+
+    def join(self):
+        if self.worker is None:
+            return
+        self.worker.join()
+        self.worker = None
+        if self.worker_error is not None:
+            error, self.worker_error = self.worker_error, None
+            raise error
+        self.finish()
@@ -0,0 +1,64 @@
+from beet import Context
+from model_resolver.utils import PackGetterV2, resolve_key
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any
+
+
+@dataclass
+class TagResolver:
+    """
+    Members of the item tags of the vanilla and project data packs, use `ctx.inject(TagResolver)`.
+    The merged tags are built once per context and the expansion of each nested tag is memoized.
+    They are rebuilt when the project adds item tags, call `invalidate` after editing an existing one.
+    """
+    ctx: Context
+    resolved: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    project_tag_count: int = -1
+
+    @cached_property
+    def item_tags(self) -> Any:
+        self.project_tag_count = len(self.ctx.data.item_tags)
+        return PackGetterV2.from_context(self.ctx).data.item_tags
+
+    def invalidate(self):
+        self.__dict__.pop("item_tags", None)
+        self.resolved.clear()
+
+    def members(self, tag: str) -> tuple[str, ...]:
+        """
+        Item ids of a tag (with or without #), nested tags expanded, in order and without duplicates
+        """
+        if self.project_tag_count != -1 and self.project_tag_count != len(self.ctx.data.item_tags):
+            self.invalidate()
+        return self._members(resolve_key(tag.removeprefix("#")), ())
+
+    def first_member(self, tag: str) -> str:
+        members = self.members(tag)
+        if not members:
+            raise ValueError(f"Tag #{tag.removeprefix('#')} is empty")
+        return members[0]
+
+    def _members(self, tag: str, stack: tuple[str, ...]) -> tuple[str, ...]:
+        if tag in self.resolved:
+            return self.resolved[tag]
+        if tag in stack:
+            raise ValueError(f"Tag #{tag} includes itself")
+        tag_file = self.item_tags.get(tag)
+        if tag_file is None:
+            raise ValueError(f"Tag #{tag} not found")
+        res: dict[str, None] = {}
+        for entry in tag_file.data.get("values", []):
+            required = True
+            if isinstance(entry, dict):
+                required = entry.get("required", True)
+                entry = entry["id"]
+            if entry.startswith("#"):
+                nested = resolve_key(entry[1:])
+                if not required and self.item_tags.get(nested) is None:
+                    continue
+                res.update(dict.fromkeys(self._members(nested, (*stack, tag))))
+            else:
+                res[resolve_key(entry)] = None
+        self.resolved[tag] = tuple(res)
+        return self.resolved[tag]
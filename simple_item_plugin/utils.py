@@ -1,4 +1,6 @@
-import random
+import hashlib
+from functools import cache
+from weakref import WeakValueDictionary
 from beet import Context, Language, Generator
 from simple_item_plugin.types import Lang, TranslatedString, NAMESPACE
 from typing import Union, Optional, Self, Iterable, Protocol, Any, runtime_checkable
@@ -10,13 +12,13 @@ import logging
 logger = logging.getLogger("simple_item_plugin")
 
 
-def generate_uuid() -> list[int]:
-    return [
-        random.randint(0, 0xFFFFFFFF),
-        random.randint(0, 0xFFFFFFFF),
-        random.randint(0, 0xFFFFFFFF),
-        random.randint(0, 0xFFFFFFFF),
-    ]
+def generate_uuid(key: str, seed: Optional[str] = None) -> list[int]:
+    """
+    UUID as 4 ints derived from `key` (e.g. the item id) and a project seed (the namespace by default),
+    the same key gives the same UUID on every build
+    """
+    digest = hashlib.sha256(f"{seed if seed is not None else NAMESPACE}:{key}".encode()).digest()
+    return [int.from_bytes(digest[i:i + 4], "big") for i in range(0, 16, 4)]
 
 
 def export_translated_string(ctx: Union[Context, Generator], translation: TranslatedString):
@@ -34,6 +36,29 @@ def export_translated_string(ctx: Union[Context, Generator], translation: Transl
 class SimpleItemPluginOptions(BaseModel):
     generate_guide: bool = True
     disable_guide_cache: bool = False
+    compact_guide: bool = True
+    guide_volumes: bool = False
+    # renders of vanilla items shared by every project of the machine, in ~/.cache/simple_item_plugin by default.
+    # SIMPLE_ITEM_PLUGIN_SHARED_RENDER_CACHE=0 disables it whatever the config, e.g. on CI
+    shared_render_cache: bool = False
+    shared_render_cache_path: Optional[str] = None
+    # render the guide items in a background thread while the rest of the build runs,
+    # on the main thread on macOS where OpenGL needs it
+    background_render: bool = False
+    # render size of the guide icons, the default of model_resolver when not set
+    guide_render_size: Optional[int] = None
+    # render size of the big result slots, same as the grid slots when not set
+    guide_big_render_size: Optional[int] = None
+    # lossless palette reduction and maximum compression of the guide textures
+    optimize_guide_textures: bool = True
+    # add "used in" pages listing the recipes using each item
+    guide_usage_pages: bool = False
+    # blank pages left by removed items before the guide pages are reassigned from scratch
+    guide_max_blank_pages: int = 16
+    # time and memory of the guide phases, logged and written to guide_metrics.json
+    guide_metrics: bool = False
+    # directory of the grayscale templates recolored with the mineral palettes, relative to the project
+    mineral_texture_templates: Optional[str] = None
     add_give_all_function: bool = True
     item_for_pack_png: Optional[str] = None
     license_path: Optional[str] = None
@@ -53,6 +78,33 @@ def real_ctx(ctx: Union[Context, Generator]) -> Context:
 
 _DEFAULT = object()
 
+class RegistryKey:
+    """
+    Interned (registry base class, id) pair, two keys are equal only if they are the same object.
+    A key is only interned while it is referenced, the table doesn't outlive the builds
+    """
+    __slots__ = ("base", "id", "_hash", "__weakref__")
+    _interned: "WeakValueDictionary[tuple[type, str], RegistryKey]" = WeakValueDictionary()
+
+    def __init__(self, base: type, id: str):
+        self.base = base
+        self.id = id
+        self._hash = hash((base, id))
+
+    @classmethod
+    def get(cls, base: type, id: str) -> "RegistryKey":
+        key = cls._interned.get((base, id))
+        if key is None:
+            key = cls._interned.setdefault((base, id), cls(base, id))
+        return key
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return f"RegistryKey({self.base.__name__}, {self.id!r})"
+
+
 class Registry(BaseModel):
     class Config: 
         arbitrary_types_allowed = True
@@ -71,12 +123,45 @@ class Registry(BaseModel):
         return set(res)
     
     @classmethod
+    @cache
     def _registry_base_class(cls) -> type:
         for base in cls.__mro__:
             if Registry in base.__bases__:
                 return base
         raise TypeError(f"{cls} is not a subclass of {Registry}")
 
+    @property
+    def registry_key(self) -> RegistryKey:
+        return RegistryKey.get(self._registry_base_class(), self.id)
+
+    def __hash__(self) -> int:
+        return hash(self.registry_key)
+
+    def __eq__(self, other: object) -> bool:
+        # the same registry and id is the same object, no deep comparison of the fields
+        if self is other:
+            return True
+        if not isinstance(other, Registry):
+            return NotImplemented
+        return self.registry_key is other.registry_key
+
+    @classmethod
+    def construct_trusted(cls, **data: Any) -> Self:
+        """
+        Build an object from data produced by the plugin itself, without the pydantic validation.
+        User facing objects keep the normal constructor, only `check_invariants` is run here
+        """
+        obj = cls.model_construct(**data)
+        obj.check_invariants()
+        return obj
+
+    def check_invariants(self):
+        """
+        Cheap checks of the objects built with `construct_trusted`
+        """
+        if not isinstance(self.id, str) or not self.id:
+            raise ValueError(f"Invalid {type(self).__name__} id {self.id!r}")
+
     def export(self, ctx: Union[Context, Generator], *args,  **kwargs) -> Self:
         ctx = real_ctx(ctx)
         bases_cls = self._registry_bases_class()
@@ -1,3 +1,4 @@
+from .api import PublicApi
 from .plugin import beet_default
 
-__all__ = ["beet_default"]
+__all__ = ["beet_default", "PublicApi"]
@@ -1,7 +1,7 @@
 import logging
 import re
 
-from beet import Context, Function, FunctionTag
+from beet import Context, Function, FunctionTag, PathSpecOption
 
 from .models import Versioning, VersioningOptions
 from .utils import call_if_version_match
@@ -9,7 +9,23 @@ from .utils import call_if_version_match
 
 logger = logging.getLogger(__name__)
 
-PUBLIC_PAT = re.compile("^#>? @public")
+PUBLIC_PAT = re.compile(r"^#>?\s*@public\b")
+
+
+class PublicApi:
+    """Functions made public by the plugins that generate them
+
+    Use `ctx.inject(PublicApi).register(path)` with the path before the version
+      injection, instead of relying on a `# @public` header being found.
+    """
+
+    paths: dict[str, None]
+
+    def __init__(self, ctx: Context):
+        self.paths = {}
+
+    def register(self, path: str):
+        self.paths[path] = None
 
 
 def generate_call(ctx: Context, opts: VersioningOptions, path: str):
@@ -18,7 +34,12 @@ def generate_call(ctx: Context, opts: VersioningOptions, path: str):
     base_path = path.replace(opts.api.implementation_prefix, "")
 
     version_check = ctx.generate[opts.api.version_check_path](
-        base_path, Function(call_if_version_match(opts.scoreholder, opts.version, path))
+        base_path,
+        Function(
+            call_if_version_match(
+                opts.scoreholder, opts.version, path, opts.packed_version
+            )
+        ),
     )
     api_path = ctx.generate[opts.api.tag_path](
         base_path, FunctionTag({"values": [version_check]})
@@ -27,20 +48,59 @@ def generate_call(ctx: Context, opts: VersioningOptions, path: str):
     logger.info(api_path)
 
 
-def generate_api(ctx: Context):
-    """Generates API calls based on `@public` listed inside of function files
+def is_public(func: Function) -> bool:
+    """Looks for `@public` in the leading doc comment, the body isn't scanned"""
+
+    for line in func.lines:
+        if not line.startswith("#"):
+            return False
+        if PUBLIC_PAT.match(line):
+            return True
+    return False
 
-    Note: Must be the very first line of the file
 
-    TODO: Support @public on any line of the function doc comment
-            https://github.com/SpyglassMC/Spyglass/wiki/IMP-Doc
+def generate_api(ctx: Context):
+    """Generates API calls for the registered `PublicApi` functions
+
+    Function files written by hand are still scanned for `@public`
+      on any line of their doc comment (https://github.com/SpyglassMC/Spyglass/wiki/IMP-Doc).
     """
 
-    opts = ctx.inject(Versioning).opts
+    versioning = ctx.inject(Versioning)
+    opts = versioning.opts
+
+    # registered before the version injection, follow the rename
+    substitute = opts.refactor.compile(ctx.template)
+    public: dict[str, None] = {}
+    for path in ctx.inject(PublicApi).paths:
+        if path not in ctx.data.functions:
+            path = substitute(path)
+        if path in ctx.data.functions:
+            public[path] = None
+
+    if versioning.public_functions is not None and versioning.scanned_functions is not None:
+        # the functions of the refactor match were scanned by the single pass injection,
+        # the other ones matching the api are scanned here
+        public.update(dict.fromkeys(versioning.public_functions))
+        scanned = versioning.scanned_functions
+        match = opts.api.match
+        if not isinstance(match, PathSpecOption):
+            match = PathSpecOption.parse_obj(match)
+        spec = PathSpecOption.compile(match.resolve(ctx.template))
+        if spec is None:
+            return
+        for path, func in list(ctx.data.functions.items()):
+            if not spec.match_file(path):
+                continue
+            if path in public or (path not in scanned and is_public(func)):
+                generate_call(ctx, opts, path)
+        return
 
     query = ctx.query(match=opts.api.match, extend=Function)
     if not Function in query:
         return
     for path, func in query[Function].keys():
-        if func.lines and path is not None and PUBLIC_PAT.match(func.lines[0]):
+        if path is None:
+            continue
+        if path in public or is_public(func):
             generate_call(ctx, opts, path)
@@ -53,6 +53,7 @@ def resolve_func(ctx: Context, opts: VersioningOptions):
                 opts.scoreholder,
                 opts.version,
                 ctx.generate.path(opts.lantern_load.function_path),
+                opts.packed_version,
             )
         ),
     )
@@ -70,6 +71,11 @@ def set_version(generate: Generator, opts: VersioningOptions):
                 f"scoreboard players set {opts.scoreholder}.{name} load.status {part}\n"
                 for name, part in opts.version.named_parts()
             )
+            + (
+                f"scoreboard players set {opts.scoreholder}.version load.status {opts.version.packed()}\n"
+                if opts.packed_version
+                else ""
+            )
             + f"scoreboard players set {opts.scoreholder}.set load.status 1"
         ),
     )
@@ -93,12 +99,18 @@ def resolve_advancement(advancement: Advancement, opts: VersioningOptions):
       check for the correct scoreholder_part (TODO: make this clearer probably).
     """
 
+    checks = (
+        [("version", opts.version.packed())]
+        if opts.packed_version
+        else opts.version.named_parts()
+    )
+
     criteria = advancement.data["criteria"]
     for requirement in criteria.values():
         conditions = requirement.setdefault("conditions", {})
         player_conditions = conditions.setdefault("player", [])
 
-        for name, number in opts.version.named_parts():
+        for name, number in checks:
             scoreholder_part = f"{opts.scoreholder}.{name}"
             version_check = {
                 "condition": "minecraft:value_check",
@@ -134,6 +146,8 @@ def enumerate_func(ctx: Context, opts: VersioningOptions) -> str:
       already highest version, then we go down to the next step.
 
     This goes until we've reached the end of each version step.
+
+    With `packed_version`, the whole version is compared at once.
     """
 
     # context generators
@@ -143,6 +157,23 @@ def enumerate_func(ctx: Context, opts: VersioningOptions) -> str:
 
     set_version_path = set_version(generate_enumerate, opts)
 
+    if opts.packed_version:
+        # a single comparison, no chain of steps
+        packed = opts.version.packed()
+        enumerate_function = generate_function(
+            "enumerate",
+            Function(
+                f"scoreboard players reset {opts.scoreholder}.set load.status\n"
+                f"scoreboard players add {opts.scoreholder}.version load.status 0\n"
+                "execute "
+                f"if score {opts.scoreholder}.version load.status matches ..{packed - 1} "
+                f"run function {set_version_path}"
+            ),
+        )
+        return generate_tag(
+            "enumerate", merge=FunctionTag({"values": [enumerate_function]})
+        )
+
     # We iterate through our version parts (we'll use major, minor, patch) **backwards**:
     #  `enumerate` calls major which calls minor which calls patch
     #  Make `enumerate/patch` first, return the path as the `last_step_function`
@@ -11,6 +11,10 @@ from .types import JsonDict, JsonType
 warnings.filterwarnings("ignore", message=".*Pydantic serializer warnings.*", category=UserWarning)
 
 
+PACKED_PART_BASE = 1000
+MAX_SCORE = 2**31 - 1
+
+
 class ContextualModel(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
     
@@ -43,6 +47,19 @@ class Version(RootModel[dict[str, int]]):
     def named_parts(self):
         return list(self.root.items())
 
+    def packed(self) -> int:
+        """The version as one integer, 1.2.3 is 1002003"""
+        packed = 0
+        for name, number in self.root.items():
+            if number >= PACKED_PART_BASE:
+                raise ValueError(
+                    f"{name} is too big to be packed: {number} >= {PACKED_PART_BASE}"
+                )
+            packed = packed * PACKED_PART_BASE + number
+        if packed > MAX_SCORE:
+            raise ValueError(f"The version {self} is too big to be packed in a score")
+        return packed
+
     def __str__(self):
         return ".".join(str(value) for value in self.root.values())
 
@@ -74,6 +91,10 @@ class VersioningOptions(ContextualModel):
     }  # type: ignore
     lantern_load: LanternLoadOptions = LanternLoadOptions()
     api: ApiOptions = ApiOptions()
+    # rewrite contents and paths and find the `@public` functions in one traversal
+    single_pass: bool = False
+    # compare the version as one `<scoreholder>.version` score, every version of the pack must use it
+    packed_version: bool = False
 
     @property
     def namespace(self):
@@ -87,6 +108,8 @@ class VersioningOptions(ContextualModel):
     def init_version(self):
         if self.version is None:
             self.version = Version.from_parts(self.schema_, self.ctx)
+        if self.packed_version:
+            self.version.packed()
         return self
 
     @classmethod
@@ -138,6 +161,12 @@ class VersioningOptions(ContextualModel):
 
 class Versioning:
     opts: VersioningOptions
+    # paths of the `@public` functions, found by the single pass injection
+    public_functions: list[str] | None
+    # paths of every function the single pass injection looked at
+    scanned_functions: set[str] | None
 
     def __init__(self, ctx: Context):
         self.opts = ctx.validate("smithed.versioning", VersioningOptions)
+        self.public_functions = None
+        self.scanned_functions = None
@@ -1,14 +1,17 @@
-from beet import Context, Function, FunctionTag, Generator
+from beet import Context, Function, FunctionTag, Generator, TextFileBase
 from beet.contrib.find_replace import find_replace
 from beet.contrib.rename_files import rename_files
 
-from .api import generate_api
+from .api import generate_api, is_public
 from .load import generate_load
 from .models import ContextualModel, Versioning
 
 
 def inject_version(ctx: Context):
     opts = ctx.inject(Versioning).opts
+    if opts.single_pass:
+        ctx.require(inject_version_single_pass)
+        return
 
     substitution = opts.refactor.dict()
     del substitution["match"]
@@ -20,6 +23,37 @@ def inject_version(ctx: Context):
     ctx.require(rename_files(data_pack={"match": opts.refactor.match} | substitution))
 
 
+def inject_version_single_pass(ctx: Context):
+    """Same as `find_replace` followed by `rename_files`, in a single traversal
+
+    Each matched file gets its content and its path rewritten at once,
+      `@public` functions are recorded on the way for `generate_api`.
+    """
+
+    versioning = ctx.inject(Versioning)
+    opts = versioning.opts
+
+    substitute = opts.refactor.compile(ctx.template)
+    selection = ctx.query.from_pack(ctx.data).prepare(match=opts.refactor.match).select()
+
+    versioning.public_functions = []
+    versioning.scanned_functions = set()
+    for file_type, entries in selection.items():
+        for (_, file_instance), (pack, path) in entries.items():
+            if isinstance(file_instance, TextFileBase):
+                file_instance.text = substitute(file_instance.text)
+
+            dest = substitute(path)
+            if dest != path:
+                del pack[file_type][path]
+                pack[file_type][dest] = file_instance
+
+            if isinstance(file_instance, Function):
+                versioning.scanned_functions.add(dest)
+                if is_public(file_instance):
+                    versioning.public_functions.append(dest)
+
+
 def beet_default(ctx: Context):
     """This plugins generates all the versioning requirements that LL needs
 
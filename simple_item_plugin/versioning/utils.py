@@ -1,12 +1,21 @@
 from .models import Version
 
 
-def call_if_version_match(scoreholder: str, version: Version, path: str):
+def call_if_version_match(
+    scoreholder: str, version: Version, path: str, packed: bool = False
+):
     """Generates a version check for `{opts.lantern_load.version_check}` functions
 
     Checks each versioning score exactly before running `impl` function.
+    With `packed`, only the `version` score is checked.
     """
 
+    if packed:
+        return (
+            f"execute if score {scoreholder}.version load.status matches {version.packed()} "
+            f"run function {path}\n"
+        )
+
     inner_execute = " ".join(
         f"if score {scoreholder}.{name} load.status matches {part}"
         for name, part in version.named_parts()
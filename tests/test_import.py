@@ -0,0 +1,10 @@
+import importlib
+import pkgutil
+
+import simple_item_plugin
+
+
+def test_import_every_module():
+    # the namespace is only set by the plugin, nothing may need it at import time
+    for module in pkgutil.walk_packages(simple_item_plugin.__path__, "simple_item_plugin."):
+        importlib.import_module(module.name)
@@ -0,0 +1,42 @@
+from beet import Function, run_beet
+
+from simple_item_plugin.versioning import beet_default as versioning
+
+
+def build_api(single_pass: bool) -> dict[str, list[str]]:
+    config = {
+        "id": "demo",
+        "version": "1.2.3",
+        "meta": {
+            "smithed": {
+                "versioning": {
+                    "single_pass": single_pass,
+                    "refactor": {
+                        "match": "demo:impl/*",
+                        "find": "demo:impl/",
+                        "replace": "demo:impl/v1.2.3/",
+                    },
+                    "api": {
+                        "match": "demo:*",
+                        "implementation_prefix": "demo:",
+                    },
+                },
+            },
+        },
+    }
+    with run_beet(config) as ctx:
+        ctx.data["demo:impl/tick"] = Function(["say tick"])
+        ctx.data["demo:impl/internal"] = Function(["say internal"])
+        ctx.data["demo:impl/api/give"] = Function(["# @public", "say give"])
+        # matches the api but not the refactor
+        ctx.data["demo:hand_written/api"] = Function(["#> demo:hand_written/api", "# @public", "say api"])
+        ctx.require(versioning)
+        return {path: function.lines for path, function in ctx.data.functions.items()}
+
+
+def test_single_pass_generates_the_same_api():
+    default = build_api(single_pass=False)
+    single_pass = build_api(single_pass=True)
+    assert single_pass == default
+    assert any("demo:hand_written/api" in line for lines in default.values() for line in lines)
+    assert any("demo:impl/v1.2.3/api/give" in line for lines in default.values() for line in lines)